@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Compares the ways an array task can fetch its command from commands.txt:
+#   sed-quit : sed "N q;d"   (what the single-command path used to do)
+#   sed-scan : sed -n "N p"  (what the maxcommands path used to do; reads the whole file)
+#   index    : getcmd N      (seek through commands.idx, as the submit script does now)
+#
+# The rundir is built by SLURM_Array.py itself (-d, so nothing is submitted), and the
+# getcmd function is taken from the submit script it writes.
+#
+# usage: benchmarks/bench_lookup.py [sizes...]     e.g. benchmarks/bench_lookup.py 1000 1000000
+
+import sys
+import os
+import io
+import shutil
+import subprocess
+import tempfile
+import time
+
+HERE        = os.path.dirname(os.path.abspath(__file__))
+SLURM_ARRAY = os.path.join(os.path.dirname(HERE), "SLURM_Array.py")
+SIZES       = [10**3, 10**4, 10**5, 10**6]
+NLOOKUPS    = 50
+
+LOOKUPS = {
+	"sed-quit": 'for i in $TASKS; do sed "$((1 + i)) q;d" $RUNDIR/commands.txt > /dev/null; done',
+	"sed-scan": 'for i in $TASKS; do sed -n "$((1 + i)) p" $RUNDIR/commands.txt > /dev/null; done',
+	"index":    'eval "$GETCMD"; for i in $TASKS; do getcmd $i > /dev/null; done',
+}
+
+def make_rundir(workdir, ncmds):
+	cmdsfile = os.path.join(workdir, "commands.in")
+	cmdsh = io.open(cmdsfile, "wb")
+	for i in range(ncmds):
+		cmdsh.write(("runAssembly sample_" + str(i) + ".fasta -o sample_" + str(i) + ".fasta.out\n").encode("ascii"))
+	cmdsh.close()
+	rundir = os.path.join(workdir, "bench")
+	subprocess.check_call([SLURM_ARRAY, "-d", "-r", rundir, "-c", cmdsfile])
+	return rundir
+
+def get_getcmd(rundir):
+	scripth = io.open(os.path.join(rundir, os.path.basename(rundir) + ".sh"), "rb")
+	lines = list()
+	for line in scripth:
+		line = line.decode("ascii")
+		if line.startswith("getcmd()") or len(lines) > 0:
+			lines.append(line)
+			if line.startswith("}"):
+				break
+	scripth.close()
+	return "".join(lines)
+
+def time_lookup(snippet, rundir, getcmd, tasks):
+	env = dict(os.environ)
+	env["RUNDIR"] = rundir
+	env["GETCMD"] = getcmd
+	env["TASKS"]  = " ".join([str(i) for i in tasks])
+	start = time.time()
+	subprocess.check_call(["bash", "-c", snippet], env = env)
+	return (time.time() - start) / len(tasks)
+
+def main():
+	sizes = [int(s) for s in sys.argv[1:]] or SIZES
+	print("lines\tmethod\tms_per_lookup")
+	for ncmds in sizes:
+		workdir = tempfile.mkdtemp(prefix = "bench_lookup_")
+		try:
+			rundir = make_rundir(workdir, ncmds)
+			getcmd = get_getcmd(rundir)
+			# spread the lookups over the whole file; late tasks are the expensive ones for sed
+			tasks  = [int(ncmds * (k + 1) / float(NLOOKUPS)) - 1 for k in range(NLOOKUPS)]
+			for method in ["sed-quit", "sed-scan", "index"]:
+				secs = time_lookup(LOOKUPS[method], rundir, getcmd, tasks)
+				print(str(ncmds) + "\t" + method + "\t" + "%.3f" % (secs * 1000.0))
+				sys.stdout.flush()
+		finally:
+			shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+	main()
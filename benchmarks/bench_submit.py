@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+# Times SLURM_Array end to end against stand-ins for sbatch and srun, for growing
+# command lists, in the two modes an array job can run in:
+#   normal      : -x at least the number of commands, so each array task runs one command
+#   maxcommands : the default -x, so each array task runs its stripe of commands through srun
+#
+# For each size and mode it measures
+#   submit_s    : SLURM_Array -c commands -r rundir, from reading the commands to sbatch returning
+#   resubmit_s  : the same again, replacing the now existing rundir
+#   task_s      : the mean wall time of a sample of array tasks, run the way Slurm would run them
+#   command_ms  : task_s per command the sampled tasks ran, i.e. the per-command launch overhead
+# The commands themselves are `true`, so the task times are all overhead.
+#
+# The stand-ins are written to a temporary directory put first on PATH: sbatch hands out job
+# numbers, and srun runs a job step with its --output and --error. If there is no `time` on
+# PATH a stand-in for GNU time is added too, and the results say so. SLURM_Array.py is run
+# as itself, so under the interpreter its #! line names.
+#
+# usage: benchmarks/bench_submit.py [-o results.json] [sizes...]   e.g. benchmarks/bench_submit.py 1000 10000
+
+import sys
+import os
+import io
+import re
+import json
+import shutil
+import socket
+import argparse
+import datetime
+import subprocess
+import tempfile
+import time
+
+HERE        = os.path.dirname(os.path.abspath(__file__))
+SLURM_ARRAY = os.path.join(os.path.dirname(HERE), "SLURM_Array.py")
+SIZES       = [10**3, 10**4, 10**5, 10**6]
+MODES       = ["normal", "maxcommands"]
+NTASKS      = {"normal": 20, "maxcommands": 2}
+
+STUBS = {
+	"sbatch": '''\
+#!/usr/bin/env bash
+# sbatch stand-in: prints a new job number
+(
+	flock -x 9 || exit 1
+	jobnum=$((`cat ${STUBDIR}/jobnum 2>/dev/null || echo 1000` + 1))
+	echo ${jobnum} > ${STUBDIR}/jobnum
+	echo "Submitted batch job ${jobnum}"
+) 9>> ${STUBDIR}/jobs.lock
+''',
+	"srun": '''\
+#!/usr/bin/env bash
+# srun stand-in: runs the job step here, with its --output and --error (%A, %a and %s filled in)
+out=/dev/stdout
+err=/dev/stderr
+while [[ "$1" == --* ]] ; do
+	case "$1" in
+		--output=*) out="${1#--output=}" ;;
+		--error=*)  err="${1#--error=}" ;;
+	esac
+	shift
+done
+out=${out//%A/${SLURM_ARRAY_JOB_ID}} ; out=${out//%a/${SLURM_ARRAY_TASK_ID}} ; out=${out//%s/${RANDOM}}
+err=${err//%A/${SLURM_ARRAY_JOB_ID}} ; err=${err//%a/${SLURM_ARRAY_TASK_ID}} ; err=${err//%s/${RANDOM}}
+"$@" > "${out}" 2> "${err}"
+''',
+}
+
+TIME_STUB = '''\
+#!/usr/bin/env bash
+# GNU time stand-in: runs the command, then prints a report in the format SLURM_Array asks for
+shift 2
+start=`date +%s%N`
+"$@"
+status=$?
+ms=$(( (`date +%s%N` - start) / 1000000 ))
+[ ${status} -ne 0 ] && echo "Command exited with non-zero status ${status}" >&2
+printf ' \\tFull Command:                      %s \\n\\tMemory (kb):                       0 \\n\\tTime (seconds):                    %d.%03d \\n' "$*" $((ms / 1000)) $((ms % 1000)) >&2
+exit ${status}
+'''
+
+def which(program):
+	for path in os.environ.get("PATH", "").split(os.pathsep):
+		if os.access(os.path.join(path, program), os.X_OK):
+			return os.path.join(path, program)
+	return None
+
+def make_stubs(stubdir):
+	stubs = dict(STUBS)
+	if which("time") == None:
+		stubs["time"] = TIME_STUB
+	for name, text in stubs.items():
+		path = os.path.join(stubdir, name)
+		stubh = io.open(path, "wb")
+		stubh.write(text.encode("ascii"))
+		stubh.close()
+		os.chmod(path, 0o755)
+	return "time" in stubs
+
+def write_commands(workdir, ncmds):
+	cmdsfile = os.path.join(workdir, "commands.in")
+	cmdsh = io.open(cmdsfile, "wb")
+	for i in range(ncmds):
+		cmdsh.write(("true sample_" + str(i) + ".fasta -o sample_" + str(i) + ".fasta.out\n").encode("ascii"))
+	cmdsh.close()
+	return cmdsfile
+
+def submit(env, workdir, cmdsfile, rundir, options):
+	start = time.time()
+	output = subprocess.check_output([SLURM_ARRAY, "-c", cmdsfile, "-r", rundir] + options, env = env, cwd = workdir)
+	secs = time.time() - start
+	jobnums = re.findall(r"submitted job (\d+)", output.decode("ascii"))
+	return secs, jobnums[-1]
+
+## the array range of the submit script, and the script itself
+def get_array(workdir, rundir):
+	script = os.path.join(workdir, rundir, rundir + ".sh")
+	scripth = io.open(script, "rb")
+	last = None
+	for line in scripth:
+		match = re.match(r"^#SBATCH --array=0-(\d+)", line.decode("ascii"))
+		if match != None:
+			last = int(match.group(1))
+	scripth.close()
+	return script, last
+
+## runs a sample of the array tasks, one after another, as Slurm would; returns the mean seconds per task
+def time_tasks(env, workdir, script, jobnum, tasks):
+	devnull = io.open(os.devnull, "wb")
+	start = time.time()
+	for task in tasks:
+		task_env = dict(env)
+		task_env["SLURM_ARRAY_JOB_ID"]  = jobnum
+		task_env["SLURM_ARRAY_TASK_ID"] = str(task)
+		task_env["SLURM_CPUS_PER_TASK"] = "1"
+		subprocess.check_call(["bash", script], env = task_env, cwd = workdir, stdout = devnull, stderr = devnull)
+	devnull.close()
+	return (time.time() - start) / len(tasks)
+
+## the number of commands the array tasks ran, according to completed.tsv
+def count_completed(workdir, rundir):
+	path = os.path.join(workdir, rundir, "completed.tsv")
+	if not os.path.isfile(path):
+		return 0
+	completedh = io.open(path, "rb")
+	count = len(completedh.readlines())
+	completedh.close()
+	return count
+
+def bench(env, ncmds, mode):
+	workdir = tempfile.mkdtemp(prefix = "bench_submit_")
+	try:
+		cmdsfile = write_commands(workdir, ncmds)
+		rundir   = "bench_" + mode
+		options  = list()
+		if mode == "normal":
+			options = ["-x", str(ncmds)]
+		submit_s, jobnum   = submit(env, workdir, cmdsfile, rundir, options)
+		resubmit_s, jobnum = submit(env, workdir, cmdsfile, rundir, options)
+		script, last = get_array(workdir, rundir)
+		ntasks = min(NTASKS[mode], last + 1)
+		tasks  = [int((last + 1) * k / float(ntasks)) for k in range(ntasks)]
+		task_s = time_tasks(env, workdir, script, jobnum, tasks)
+		ncompleted = count_completed(workdir, rundir)
+		return {
+			"commands":    ncmds,
+			"mode":        mode,
+			"array_tasks": last + 1,
+			"submit_s":    round(submit_s, 4),
+			"resubmit_s":  round(resubmit_s, 4),
+			"tasks_timed": ntasks,
+			"task_s":      round(task_s, 4),
+			"command_ms":  round(task_s * ntasks * 1000.0 / max(1, ncompleted), 3),
+		}
+	finally:
+		shutil.rmtree(workdir)
+
+def main():
+	parser = argparse.ArgumentParser(description = "Times SLURM_Array submission and array task launch against stand-ins for sbatch and srun.")
+	parser.add_argument("-o", "--output", dest = "output", default = "bench_submit.json", help = "The file to write the results to, as JSON. Default: bench_submit.json")
+	parser.add_argument("--modes", dest = "modes", default = ",".join(MODES), help = "Comma-separated modes to time. Default: " + ",".join(MODES))
+	parser.add_argument("sizes", nargs = "*", type = int, help = "Numbers of commands. Default: " + " ".join([str(s) for s in SIZES]))
+	args = parser.parse_args()
+
+	stubdir = tempfile.mkdtemp(prefix = "bench_stubs_")
+	try:
+		time_stub = make_stubs(stubdir)
+		env = dict(os.environ)
+		env["PATH"]    = stubdir + os.pathsep + env.get("PATH", "")
+		env["STUBDIR"] = stubdir
+		version = subprocess.check_output([SLURM_ARRAY, "-v"], stderr = subprocess.STDOUT, env = env).decode("ascii").split()[-1]
+
+		results = list()
+		print("commands\tmode\tarray_tasks\tsubmit_s\tresubmit_s\ttask_s\tcommand_ms")
+		for ncmds in args.sizes or SIZES:
+			for mode in args.modes.split(","):
+				result = bench(env, ncmds, mode)
+				results.append(result)
+				print("\t".join([str(result[key]) for key in ["commands", "mode", "array_tasks", "submit_s", "resubmit_s", "task_s", "command_ms"]]))
+				sys.stdout.flush()
+	finally:
+		shutil.rmtree(stubdir)
+
+	outputh = io.open(args.output, "wb")
+	outputh.write(json.dumps({
+		"version":   version,
+		"python":    sys.version.split()[0],
+		"host":      socket.gethostname(),
+		"date":      datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+		"time_stub": time_stub,
+		"results":   results,
+	}, indent = 1, sort_keys = True).encode("ascii"))
+	outputh.close()
+	print("Wrote " + args.output)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+# Checks SLURM_Array --watch against a stand-in for sacct that plays out a schedule of array jobs
+# on a simulated clock, so that a run of hours on a cluster takes a second here:
+#   watch_a : 12 tasks, 4 at a time and 90s each, after 5 minutes in the queue; task 7 fails
+#   watch_b : 3 tasks, done within the first minute
+#   watch_c : never known to sacct (as if it was submitted to another cluster)
+#
+# The stand-in answers like sacct --noheader --parsable2 --allocations --format=JobID,State: a
+# line for each started task, and one line for the pending tasks of each array (1001_[4-11]).
+# With --starttime, tasks that ended before it are left out, as sacct leaves them out. It logs
+# each call, with the simulated time and the number of records it answered with, to calls.jsonl.
+# The calls numbered in SACCT_STUB_FAIL (or all of them, for "all") fail, as when slurmdbd is down.
+#
+# watch_jobs is run in this process with time.sleep and the clock it polls by replaced by the
+# simulated clock, which the stand-in is handed through SACCT_STUB_NOW. The checks are
+#   transitions : the printed counts go from pending to running to done, with the failure counted
+#   cache       : polls after the first ask only since the last one, and the tasks sacct then leaves
+#                 out (most of them, by the last poll) still count as ended
+#   dropping    : watch_b is dropped from the polls once done, and watch_c given up on
+#   backoff     : polls slow down by WATCH_BACKOFF while nothing changes, up to WATCH_MAX, and
+#                 speed up again when things do, never below the interval
+#   minimum     : an interval below WATCH_MIN is raised to it
+#   errors      : a few failed polls are waited out, backing off, without losing what is known
+#   giving up   : WATCH_ERRORS failed polls in a row give up with a SlurmArrayError
+#
+# usage: benchmarks/check_watch.py        (exits with status 1 if any check fails)
+
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from slurm_array import core
+
+START    = 1700000000     # the simulated time the watch starts at
+INTERVAL = 30
+
+## (start, end, state) of each task of each job, in seconds after START
+SCHEDULE = {
+	"1001": [(300 + (task // 4) * 90, 390 + (task // 4) * 90, "FAILED" if task == 7 else "COMPLETED") for task in range(12)],
+	"1002": [(0, 40, "COMPLETED"), (0, 50, "COMPLETED"), (10, 60, "COMPLETED")],
+}
+NAMES = [("1001", "watch_a"), ("1002", "watch_b"), ("1003", "watch_c")]
+
+SACCT = '''\
+#!''' + sys.executable + '''
+# sacct stand-in for benchmarks/check_watch.py: plays out the schedule in schedule.json at the
+# simulated time SACCT_STUB_NOW
+import sys, os, json, datetime
+stubdir  = os.path.dirname(os.path.abspath(__file__))
+now      = float(os.environ["SACCT_STUB_NOW"])
+schedule = json.load(open(os.path.join(stubdir, "schedule.json")))
+jobs     = list()
+since    = None
+for arg in sys.argv[1:]:
+	if arg.startswith("--jobs="):
+		jobs = arg[len("--jobs="):].split(",")
+	elif arg.startswith("--starttime="):
+		since = datetime.datetime.strptime(arg[len("--starttime="):], "%Y-%m-%dT%H:%M:%S").timestamp()
+ncalls = 0
+if os.path.isfile(os.path.join(stubdir, "calls.jsonl")):
+	ncalls = len(open(os.path.join(stubdir, "calls.jsonl")).readlines())
+fail = os.environ.get("SACCT_STUB_FAIL", "")
+if fail == "all" or str(ncalls) in fail.split(","):
+	with open(os.path.join(stubdir, "calls.jsonl"), "a") as callsh:
+		callsh.write(json.dumps({"now": now, "args": sys.argv[1:], "failed": True}) + "\\n")
+	sys.exit(1)
+lines = list()
+for job in jobs:
+	pending = list()
+	for task, (start, end, state) in enumerate(schedule.get(job, list())):
+		if now < start:
+			pending.append(str(task))
+		elif now < end:
+			lines.append(job + "_" + str(task) + "|RUNNING")
+		elif since == None or end >= since:
+			lines.append(job + "_" + str(task) + "|" + state)
+	if len(pending) > 0:
+		lines.append(job + "_[" + pending[0] + "-" + pending[-1] + "%4]|PENDING")
+with open(os.path.join(stubdir, "calls.jsonl"), "a") as callsh:
+	callsh.write(json.dumps({"now": now, "args": sys.argv[1:], "records": len(lines)}) + "\\n")
+print("\\n".join(lines))
+'''
+
+## the simulated clock: time.sleep moves it on, and the clocks watch_jobs reads follow it
+class Clock(object):
+	def __init__(self):
+		self.now    = float(START)
+		self.sleeps = list()
+		self.set()
+
+	def set(self):
+		os.environ["SACCT_STUB_NOW"] = repr(self.now)
+
+	def sleep(self, seconds):
+		self.sleeps.append(seconds)
+		self.now = self.now + seconds
+		self.set()
+
+	def time(self):
+		return self.now
+
+def patch(clock):
+	import time
+	class SimulatedDatetime(datetime.datetime):
+		@classmethod
+		def now(cls, tz = None):
+			return datetime.datetime.fromtimestamp(clock.now, tz)
+	class SimulatedModule(object):
+		datetime = SimulatedDatetime
+	originals = (time.sleep, time.time, core.datetime)
+	time.sleep    = clock.sleep
+	time.time     = clock.time
+	core.datetime = SimulatedModule
+	return originals
+
+def unpatch(originals):
+	import time
+	time.sleep, time.time, core.datetime = originals
+
+## runs watch_jobs on the simulated clock, with the sacct calls numbered in fail failing; returns
+## its result (or the SlurmArrayError it raised), the lines it printed, the sleeps and the sacct calls
+def run_watch(workdir, interval, fail = ""):
+	clock     = Clock()
+	originals = patch(clock)
+	stdout    = sys.stdout
+	stderr    = sys.stderr
+	sys.stdout = io.StringIO()
+	sys.stderr = io.StringIO()
+	os.environ["SACCT_STUB_FAIL"] = fail
+	try:
+		nfailed = core.watch_jobs(None, interval)
+	except core.SlurmArrayError as exc:
+		nfailed = exc
+	finally:
+		printed = sys.stdout.getvalue().splitlines()
+		sys.stdout = stdout
+		sys.stderr = stderr
+		unpatch(originals)
+	callsh = io.open(os.path.join(workdir, "calls.jsonl"), "r")
+	calls  = [json.loads(line) for line in callsh]
+	callsh.close()
+	os.remove(os.path.join(workdir, "calls.jsonl"))
+	return nfailed, printed, clock.sleeps, calls
+
+## the counts of each printed poll
+def read_counts(printed):
+	polls = list()
+	for line in printed[1:]:
+		fields = line.split()
+		polls.append(dict((fields[k], int(fields[k + 1])) for k in range(2, 10, 2)))
+	return polls
+
+def check(results, name, ok, detail):
+	results.append(ok)
+	print(("PASS" if ok else "FAIL") + "\t" + name + "\t" + detail)
+
+def main():
+	workdir = tempfile.mkdtemp(prefix = "check_watch_")
+	cwd     = os.getcwd()
+	path    = os.environ.get("PATH", "")
+	results = list()
+	try:
+		os.chdir(workdir)
+		sacct = os.path.join(workdir, "sacct")
+		saccth = io.open(sacct, "w")
+		saccth.write(SACCT)
+		saccth.close()
+		os.chmod(sacct, 0o755)
+		schedh = io.open(os.path.join(workdir, "schedule.json"), "w")
+		schedh.write(json.dumps(dict((jobnum, [(START + start, START + end, state) for start, end, state in tasks]) for jobnum, tasks in SCHEDULE.items())))
+		schedh.close()
+		os.environ["PATH"] = workdir + os.pathsep + path
+		for jobnum, name in NAMES:
+			core.register_job(jobnum, "2023-11-14_22-13-20", name)
+
+		nfailed, printed, sleeps, calls = run_watch(workdir, INTERVAL)
+		polls = read_counts(printed)
+		ntasks = sum([len(tasks) for tasks in SCHEDULE.values()])
+		for line in printed:
+			print("  " + line)
+
+		check(results, "transitions", polls[0]["pending"] > 0 and any([poll["running"] > 0 for poll in polls]) and polls[-1]["pending"] == 0 and polls[-1]["running"] == 0 and nfailed == 1,
+			"first poll " + str(polls[0]) + ", last " + str(polls[-1]) + ", watch_jobs returned " + str(nfailed))
+
+		since = [call for call in calls[1:] if not any([arg.startswith("--starttime=") for arg in call["args"]])]
+		final = polls[-1]["completed"] + polls[-1]["failed"]
+		check(results, "cache", len(since) == 0 and final == ntasks and calls[-1]["records"] < ntasks,
+			str(len(calls) - 1 - len(since)) + " of " + str(len(calls) - 1) + " later polls used --starttime; " + str(final) + " of " + str(ntasks) + " tasks counted as ended, " + str(calls[-1]["records"]) + " of them in the last poll")
+
+		jobs = [[arg for arg in call["args"] if arg.startswith("--jobs=")][0][len("--jobs="):].split(",") for call in calls]
+		dropped_b = [k for k, polled in enumerate(jobs) if "1002" not in polled]
+		dropped_c = [k for k, polled in enumerate(jobs) if "1003" not in polled]
+		check(results, "dropping", len(dropped_b) > 0 and len(dropped_c) > 0 and dropped_c[0] == core.WATCH_MISSING and jobs[-1] == ["1001"],
+			"watch_b dropped from poll " + str(dropped_b[:1]) + ", watch_c from poll " + str(dropped_c[:1]) + ", last poll asked for " + ",".join(jobs[-1]))
+
+		backoff = True
+		for k in range(1, len(sleeps)):
+			if polls[k] == polls[k - 1]:
+				expected = min(core.WATCH_MAX, sleeps[k - 1] * core.WATCH_BACKOFF)
+			else:
+				expected = max(INTERVAL, sleeps[k - 1] / core.WATCH_BACKOFF)
+			backoff = backoff and abs(sleeps[k] - expected) < 1e-6
+		slowed = any([sleeps[k] > sleeps[k - 1] for k in range(1, len(sleeps))])
+		sped   = any([sleeps[k] < sleeps[k - 1] for k in range(1, len(sleeps))])
+		check(results, "backoff", backoff and slowed and sped and min(sleeps) >= INTERVAL and max(sleeps) <= core.WATCH_MAX,
+			"sleeps " + " ".join(["%.0f" % sleep for sleep in sleeps]))
+
+		nfailed, printed, sleeps, calls = run_watch(workdir, 0.2)
+		check(results, "minimum", min(sleeps) >= core.WATCH_MIN,
+			"--watch_interval 0.2 polled at least " + "%.1f" % min(sleeps) + "s apart")
+
+		## the seventh and eighth polls, when tasks start running again, fail: they are backed off from
+		## instead of sped up for, and the one after them asks from where the sixth left off
+		nfailed, printed, sleeps, calls = run_watch(workdir, INTERVAL, "6,7")
+		errored = read_counts(printed)
+		starts  = [[arg for arg in call["args"] if arg.startswith("--starttime=")] for call in calls]
+		check(results, "errors", nfailed == 1 and errored[-1] == polls[-1] and calls[6].get("failed") and calls[7].get("failed") and starts[6] == starts[7] == starts[8]
+				and abs(sleeps[6] - sleeps[5] * core.WATCH_BACKOFF) < 1e-6 and abs(sleeps[7] - sleeps[6] * core.WATCH_BACKOFF) < 1e-6,
+			"sleeps " + " ".join(["%.0f" % sleep for sleep in sleeps]) + "; last poll " + str(errored[-1]))
+
+		nfailed, printed, sleeps, calls = run_watch(workdir, INTERVAL, "all")
+		check(results, "giving up", isinstance(nfailed, core.SlurmArrayError) and len(calls) == core.WATCH_ERRORS,
+			str(len(calls)) + " failed polls, then: " + str(nfailed))
+	finally:
+		os.environ["PATH"] = path
+		os.chdir(cwd)
+		shutil.rmtree(workdir)
+
+	if not all(results):
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()
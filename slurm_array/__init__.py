@@ -0,0 +1,20 @@
+# slurm_array: submitting a list of commands as an array job to SLURM. Easily.
+#
+#   import slurm_array
+#   jobnums = slurm_array.submit(["runAssembly sample_1.fasta", "runAssembly sample_2.fasta"], memory = "8gb", rundir = "assembly")
+#
+# The SLURM_Array command line is slurm_array.cli.main().
+
+__version__ = "2.2.0.z.99"
+
+## problems with the commands or options given, or with submitting them
+class SlurmArrayError(Exception):
+	pass
+
+## submit is imported from slurm_array.core when first used, so that the command line
+## doesn't pay for importing it just to print its help or version
+def __getattr__(name):
+	if name == "submit":
+		from . import core
+		return getattr(core, name)
+	raise AttributeError("module 'slurm_array' has no attribute '" + name + "'")
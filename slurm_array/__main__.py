@@ -0,0 +1,8 @@
+# python -m slurm_array: the SLURM_Array command line
+
+import sys
+
+from .cli import main
+
+sys.argv[0] = "SLURM_Array"
+main()
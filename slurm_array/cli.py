@@ -0,0 +1,175 @@
+# The SLURM_Array command line: parses the options, and hands them to slurm_array.core.
+
+import sys
+import io
+import re
+import argparse
+import textwrap
+
+from . import __version__
+from . import SlurmArrayError
+
+### The command-line options; their destinations are also the keyword arguments of submit()
+def build_parser():
+	parser = argparse.ArgumentParser(description='Runs a list of commands specified on stdin as a SLURM array job. \nExample usage: cat `commands.txt | SLURM_Array` or `SLURM_Array -c commands.txt`')
+	parser.add_argument('-c', '--commandsfile', required = False, dest = "commandsfile", default = "-", help = "The file to read commands from. Default: -, meaning standard input.")
+	parser.add_argument('-q', '--queue', required = False, dest = "queue", help = "The queue(s) to send the commands to. Default: all queues you have access to.")
+	parser.add_argument('-m', '--memory', required = False, dest = "memory", default = "4gb", help = "Amount of free RAM to request for each command, and the maximum that each can use without being killed. Default: 4gb")
+	parser.add_argument('-t', '--time', required = False, dest = "time", type = str, default = "04:00:00", help = "The maximum amount of time for the job to run in d-hh:mm:ss. Default: 04:00:00")
+	parser.add_argument('-l', '--module', required = False, dest = "module", default = "", type = str, nargs = "+", help = "List of modules to load after preamble. Eg: R/3.3 python/3.6")
+	parser.add_argument('-M', '--mail', required = False, dest = "mail", type = str, help = "Email address to send notifications to. Default: None")
+	parser.add_argument('--mailtype', required = False, dest = "mailtype", default = "ALL", type = str, help = "Type of email notification to be sent if -M is specified. Options: BEGIN, END, FAIL, ALL. Default: ALL")
+	parser.add_argument('-f', '--filelimit', required = False, dest = "filelimit", default = "500G", help = "The largest file a command can create without being killed. (Preserves fileservers.) Default: 500G")
+	parser.add_argument('-b', '--concurrency', required = False, dest = "concurrency", default = "1000", help = "Maximum number of commands that can be run simultaneously across any number of machines. (Preserves network resources.) Default: 1000")
+	parser.add_argument('-x', '--maxcommands', required = False, dest = "maxcommands", default = 900, type = int, help = "Maximum number of commands that can be submitted with one submission script. If the number of commands exceeds this number, they will be batched in separate array jobs. Default: 900")
+	parser.add_argument('--duration', required = False, dest = "duration", default = "24:00:00", type = str, help = "Duration expected for each of maxcommands to run in d-hh:mm:ss. This will be multiplied by the number of batches needed to run.")
+	parser.add_argument('--shard', required = False, action = 'store_true', dest = "shard", help = "When maxcommands is exceeded, split the commands into shards of maxcommands and submit each shard as its own array job with the normal --time, instead of batching them serially within one array job. The concurrency (-b) is divided between the shards. Can't be used with --pack or --dynamic. All of the shards are logged under the same job name.")
+	parser.add_argument('--dynamic', required = False, action = 'store_true', dest = "dynamic", help = "When maxcommands is exceeded, have each array job claim the next unstarted command from a shared counter in the rundir (locked with flock) instead of running a fixed stripe of commands, so that fast array jobs pick up the slack from slow ones. Can't be used with --pack or --shard.")
+	parser.add_argument('--pack', required = False, dest = "pack", default = 0, type = int, help = "Pack this many commands into each array job, and run them concurrently on the array job's processors (-P), each through time and with its own .out and .err files. Useful for many short commands. The job time is multiplied by the number of rounds of -P commands needed. Can't be used with --shard or --dynamic. Default: 0, meaning no packing")
+	parser.add_argument('--onelog', required = False, action = 'store_true', dest = "onelog", help = "Instead of a .out, .err and command file per command, append the stdout and stderr of all the commands an array job runs to one <rundir>.<jobid>_<task>.log file, as framed records indexed in onelog.idx. Commands are run straight from commands.txt. Use --extract to get one command's output back.")
+	parser.add_argument('-P', '--processors', required = False, dest = "processors", default = "1", help = "Number of processors to reserve for each command. Default: 1")
+	parser.add_argument('-r', '--rundir', required = False, dest = "rundir", help = "Job name and the directory to create or OVERWRITE to store log information and standard output of the commands. Default: 'jYEAR-MON-DAY_HOUR-MIN-SEC_<cmd>_etal' where <cmd> is the first word of the first command.")
+	parser.add_argument('--keep_old', required = False, action = 'store_true', dest = "keep_old", help = "If the rundir already exists, keep it as <rundir>.1 (or .2, etc.) rather than deleting it.")
+	parser.add_argument('-w', '--working-directory', required = False, dest = "wd", type = str, help = "Working directory to set. Defaults to nothing.")
+	parser.add_argument('-H', required = False, action = 'store_true', dest = "HOLD", help = "Hold the execution for these commands until you release them via scontrol release <JOB-ID>")
+	parser.add_argument('--hold', required = False, action = 'store_true', dest = "hold", help = "Hold the execution for these commands until all previous jobs arrays run from this directory have finished. Uses the list of jobs as logged to .slurm_array_jobnums.db.")
+	parser.add_argument('--hold_jids', required = False, dest = "hold_jid_list", help = "Hold the execution for these commands until these specific job IDs have finished (e.g. '--hold_jid 151235' or '--hold_jid 151235,151239' )")
+	parser.add_argument('--hold_names', required = False, dest = "hold_name_list", help = "Hold the execution for these commands until these specific job names have finished (comma-sep list); accepts regular expressions. (e.g. 'SLURM_Array -c commands.txt -r this_job_name --hold_names previous_job_name,other_jobs_.+'). Uses job information as logged to .slurm_array_jobnums.db.")
+	parser.add_argument('--resume', required = False, dest = "resume", metavar = "RUNDIR", help = "Resubmit the commands of RUNDIR that have not completed successfully (they failed, or never finished) according to RUNDIR/completed.tsv, without deleting RUNDIR. Commands are recognized by a hash of their text. -c and -r are ignored; the other options apply to the resubmission.")
+	parser.add_argument('--workflow', required = False, dest = "workflow", metavar = "FILE", help = "Submit a whole workflow of command lists, given in the JSON file FILE, in one go. Each step names its commands (a file, or a list), its own options, and the steps it must wait for; steps are submitted in dependency order, independent ones concurrently. The other options given here apply to every step.")
+	parser.add_argument('--report', required = False, dest = "report", metavar = "RUNDIR", help = "Instead of submitting anything, harvest the time reports from the .err and .out files in RUNDIR into RUNDIR/report.csv, and print percentiles of memory and time used per job. Only files that are new or changed since the last report are read.")
+	parser.add_argument('--report_procs', required = False, dest = "report_procs", default = 0, type = int, help = "Number of processes to read log files with for --report. Default: 0, meaning one per CPU")
+	parser.add_argument('--auto-resources', required = False, action = 'store_true', dest = "auto_resources", help = "Set the memory (-m) and time (-t) from the 95th percentile of what previous runs of the same program used, plus headroom, as recorded in .slurm_array_history by --report. The choice and the reasons for it are printed; use with -d to see them without submitting.")
+	parser.add_argument('--watch', required = False, dest = "watch", nargs = "?", const = "", metavar = "NAMES", help = "Instead of submitting anything, follow the progress of the jobs logged to .slurm_array_jobnums.db under NAMES (comma-sep regular expressions, as for --hold_names), or of all of them, until none of their array tasks are pending or running. Prints the numbers of array tasks pending, running, completed and failed, with throughput and ETA, from one sacct call per poll. Exits with status 1 if any array task failed.")
+	parser.add_argument('--watch_interval', required = False, dest = "watch_interval", default = 30, type = float, metavar = "SECONDS", help = "The shortest time between polls for --watch, at least 10; polls slow down, up to every 10 minutes, while nothing changes. Default: 30")
+	parser.add_argument('--extract', required = False, dest = "extract", nargs = 2, metavar = ("RUNDIR", "N"), help = "Instead of submitting anything, print the stdout (and, on stderr, the stderr) of command number N (counting from 0) of a --onelog run in RUNDIR.")
+	parser.add_argument('--local', required = False, dest = "local", default = 0, type = int, metavar = "N", help = "Instead of submitting the array job, run it on this node with N workers, each running one array task at a time. The memory limit (-m) is set on a cgroup for each array task where systemd-run can make one, and otherwise as an address space rlimit, which applies to each process on its own (so concurrent --pack commands can use more in all, and Java or Go programs can fail under it); the file size limit (-f) is an rlimit. Array tasks are killed when they run over their time (-t), and the rundir is laid out just as for a cluster run. Holds are ignored. Exits with status 1 if any command did not complete successfully. Default: 0, meaning submit to SLURM")
+	parser.add_argument('-v', '--version', action = 'version', version = '%(prog)s ' + __version__)
+	parser.add_argument('-d', '--debug', action = 'store_true', dest = "debug", help = "Create the directory and script, but do not submit")
+	parser.add_argument('--showchangelog', required = False, action = 'store_true', dest = "showchangelog", help = "Show the changelog for this program.")
+
+	return parser
+
+CHANGELOG = textwrap.dedent('''\
+	Version 2.2.0.z.99: Commands can ask for their own memory, processors and time with a '#@ mem=.. cpus=.. time=..' annotation; they are submitted as an array job per resource class. Runs of only some of the commands (resource classes, --resume) number their array tasks, and so their logs, by command number where they can.
+	Version 2.1.0.z.99: Added new option '--watch' to follow the progress of the jobs in .slurm_array_jobnums.db with one sacct call per poll.
+	Version 2.0.0.z.99: SLURM_Array is now the Python 3 package slurm_array, with a submit() function for submitting from Python; SLURM_Array.py is a thin entry point that starts in a fraction of the time, and the SLURM_Array wrapper no longer loads python/2.7.
+	Version 1.13.0.z.99: Added new option '--local' to run the array job on this node with a pool of workers, under the same limits, instead of submitting it.
+	Version 1.12.0.z.99: Added new option '--workflow' to submit a dependency graph of command lists in one go.
+	Version 1.11.0.z.99: An existing rundir is moved aside and deleted in the background, without the countdown. Added new option '--keep_old' to keep it instead.
+	Version 1.10.0.z.99: Each command's exit status is recorded in completed.tsv. Added new option '--resume' to resubmit only the commands that did not complete successfully.
+	Version 1.9.0.z.99: Jobs are logged to an indexed SQLite registry, .slurm_array_jobnums.db, instead of .slurm_array_jobnums, which is imported into it.
+	Version 1.8.0.z.99: Added new options '--onelog', to log all the commands of an array job to one file, and '--extract' to read one command's output back.
+	Version 1.7.0.z.99: Added new option '--auto-resources' to set memory and time from previous runs, which --report now records in .slurm_array_history.
+	Version 1.6.0.z.99: Added new option '--report' to collect the time reports from a rundir's logs into report.csv, with memory and time percentiles per job.
+	Version 1.5.0.z.99: Commands are streamed into commands.txt rather than read into memory first; blank lines are skipped.
+	Version 1.4.0.z.99: Added new option '--shard' to submit commands beyond maxcommands as several array jobs instead of serial batches. --hold_names now holds for every job logged under a name.
+	Version 1.3.0.z.99: Added new option '--pack' to run several commands concurrently in each array job. Durations over a day are now formatted correctly.
+	Version 1.2.0.z.99: Added new option '--dynamic': when maxcommands is exceeded, array jobs claim commands from a shared counter instead of running fixed stripes.
+	Version 1.1.0.z.99: commands.txt is written with a byte-offset index (commands.idx); array tasks seek to their command instead of scanning commands.txt with sed.
+	Version 1.0.4.z.99: when maxcommands are exceeded, memory and cpus are not reset
+	Version 1.0.3.z.99: removed workdir argument from srun
+	Version 1.0.2.z.99: Fixed bug where multiple tasks were running for each command when maxcommands was exceeded.
+	Version 1.0.1.z.99: Add working directory argument and comments to maxcommands jobs
+	Version 1.0.0.z.99: This version now has maxcommands and duration for running 1000s of jobs on the cluster. I've also changed the behavior so that the output files index from zero. It's a big change, so that's why I'm incrementing it.
+	Version 0.11.1.z.99: Update concurrency to 1000
+	Version 0.11.0.z.99: Revert behavior to write.slurm_array_jobnums to current working directory.
+	Version 0.10.0.z.99: Add the -H command to act as -H on SLURM clusters
+	Version 0.9.2.z.99: Concurrency default set to 2000 based on speaking with HCC people.
+	Version 0.9.1.z.99: Changed behavior back so that rundir is created relative to the current working directory.
+	Version 0.9.0.z.99: Added new options '-t', '-d', and '-w' to set the time, a debugging flag, and working directory.
+	Version 0.8.1.z.99: Changed behavior so .slurm_array_jobnums is written to the $WORK directory.
+	Version 0.8.0.z.99: Added new options '-M' and '--mailtype' to email the user I also changed module flag to '-l' for "load module"
+	Version 0.7.0.z.99: Zhian Kamvar's translation to SLURM. Currently still a work in progress, but has basic functionality.
+	Version 0.6.8.1: Fixed bug so that -r option strips trailing slashes properly; e.g. -r log_dir/ now works properly
+	Version 0.6.8: --hold_names option now accepts regular expressions for holding against sets of jobs easily. Eg. --hold_names assembly_.+
+	Version 0.6.7.1: Fixed the -r option to now accept paths. e.g SGE_Array -c commands.txt -r logs_dir/log_dir. The "name" of the job (for --hold_names purposes) is logs_dir/log_dir; the SGE name is just log_dir.
+	Version 0.6.7: Added new option --hold_names for holding for specific job names.
+	Version 0.6.6: Added new option --hold_jid for holding for specific job ids (in addition to --hold which holds for all jobs previously run in the current dir.)
+	Version 0.6.5: Fixed some bugs, also, new option --hold
+	Version 0.6: Initial version. Reads commands on stdin or from a file, runs them as an array job.
+	''')
+
+### Input parsing. Returns an environment with members like args.queue, args.commands, args.filelimit, etc.,
+### or None if there is nothing to submit (e.g. for --report)
+def parse_input(argv = None):
+	parser = build_parser()
+	args = parser.parse_args(argv)
+
+	if args.showchangelog:
+		print(CHANGELOG)
+		return None
+
+	## core is only imported once there is work to do, so that --help, -v and --showchangelog are quick
+	from . import core
+
+	if args.extract != None:
+		core.extract_onelog(re.subn(r"/$", "", args.extract[0])[0], int(args.extract[1]))
+		return None
+
+	if args.report != None:
+		core.write_report(re.subn(r"/$", "", args.report)[0], args.report_procs)
+		return None
+
+	if args.watch != None:
+		if core.watch_jobs(args.watch or None, args.watch_interval) > 0:
+			sys.exit(1)
+		return None
+
+	## a workflow's steps each have their own commands
+	if args.workflow != None:
+		return args
+
+	## Open the commands on standard input, showing an error if there is no stdin.
+	## The commands are not read in here: args.commands streams them, one line at a time,
+	## to write_commands, so memory use does not grow with the number of commands.
+	## When resuming, the commands are already in the rundir.
+	if args.resume != None:
+		args.rundir = args.resume
+		cmdsh = io.open(re.subn(r"/$", "", args.rundir)[0] + "/commands.txt", "rb")
+	elif args.commandsfile == "-":
+		if sys.stdin.isatty():
+			print(parser.format_help())
+			return None
+		cmdsh = io.open(sys.stdin.fileno(), "rb", closefd = False)
+	else:
+		cmdsh = io.open(args.commandsfile, "rb")
+
+	## blank lines are skipped; peek at the first real command to name the job after it
+	first, args.commands = core.peek_commands(cmdsh)
+	if first == b"":
+		raise SlurmArrayError("no commands given.")
+	if args.resume != None:
+		cmdsh.close()
+		args.commands = None
+
+	## grab the executable of the first word of the first command
+	cmd = core.get_cmd_name(first)
+	args.cmdname = cmd
+	args.timestamp = core.get_timestamp(cmd)
+	## Set the rundir and path if not already set
+	if args.rundir == None:
+		rundir = args.timestamp
+		args.rundir = rundir
+
+	args.rundir = re.subn(r"/$", "", args.rundir)[0]
+
+	return args
+
+
+def main(argv = None):
+	try:
+		args = parse_input(argv)
+		if args == None:
+			return
+		from . import core
+		if args.workflow != None:
+			core.submit_workflow(args)
+		else:
+			core.run(args)
+	except (SlurmArrayError, IOError) as exc:
+		sys.stderr.write("Error: " + str(exc) + "\n")
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()
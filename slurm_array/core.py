@@ -0,0 +1,1683 @@
+# Written by Shawn O'Neil, CGRB, OSU, Jan 2014
+#This software is not free.
+
+#This software program and documentation are copyrighted by 
+#Oregon State University. The software program and 
+#documentation are supplied "as is", without any accompanying 
+#services from Oregon State University. OSU does not warrant 
+#that the operation of the program will be uninterrupted or 
+#error-free. The end-user understands that the program was 
+#developed for research purposes and is advised not to rely 
+#exclusively on the program for any reason.
+
+#IN NO EVENT SHALL OREGON STATE UNIVERSITY BE LIABLE TO ANY 
+#PARTY FOR DIRECT, INDIRECT, SPECIAL, INCIDENTAL, OR 
+#CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF 
+#THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF 
+#OREGON STATE UNIVERSITYHAS BEEN ADVISED OF THE POSSIBILITY OF 
+#SUCH DAMAGE. OREGON STATE UNIVERSITY SPECIFICALLY DISCLAIMS 
+#ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+#WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR 
+#PURPOSE AND ANY STATUTORY WARRANTY OF NON-INFRINGEMENT. THE 
+#SOFTWARE PROVIDED HEREUNDER IS ON AN "AS IS" BASIS, AND 
+#OREGON STATE UNIVERSITY HAS NO OBLIGATIONS TO PROVIDE 
+#MAINTENANCE, SUPPORT, UPDATES, ENHANCEMENTS, OR 
+#MODIFICATIONS.
+
+
+
+# The work of SLURM_Array: writing the rundir and submit scripts, and submitting them.
+# Only light modules are imported up front, so that the command line starts quickly; the
+# rest (subprocess, sqlite3, multiprocessing...) are imported by the functions that use them.
+
+import sys
+import io
+import re
+import math
+import datetime
+from datetime import timedelta
+import os
+import textwrap
+import itertools
+
+from . import SlurmArrayError
+
+
+## skips the blank lines at the start of cmds (an iterable of lines, as text or bytes); returns the
+## first command (or b"" if there are none) and an iterator over all of the commands, including the
+## first. Commands are handled as bytes from here on, so that commands.idx holds byte offsets.
+def peek_commands(cmds):
+	cmds = (to_bytes(cmd) for cmd in cmds)
+	for first in cmds:
+		if first.strip() != b"":
+			return first, itertools.chain([first], cmds)
+	return b"", None
+
+def to_bytes(cmd):
+	if isinstance(cmd, bytes):
+		return cmd
+	return cmd.encode("utf-8")
+
+def get_timestamp(cmd):
+	return datetime.datetime.now().strftime("j%Y-%m-%d_%H-%M-%S_" + cmd + "_etal")
+
+## the name of the executable of a command, for the job name and .slurm_array_history
+def get_cmd_name(command):
+	if isinstance(command, bytes):
+		command = command.decode("utf-8", "replace")
+	cmd = re.split(r"\s+", command.strip())[0]
+	cmd = os.path.basename(cmd)
+	cmd = re.subn(r"[^A-Za-z0-9]", "", cmd)[0]
+	return cmd
+
+## the number of commands each array job runs
+def get_nruns(args):
+	cmds    = args.ncommands
+	maxcmds = args.maxcommands
+	NRUNS   = int(math.ceil(cmds/float(maxcmds)))
+	if args.pack > 0:
+		# packing never makes more than maxcommands array jobs
+		NRUNS = max(args.pack, NRUNS)
+	return NRUNS
+
+## the number of array jobs needed when packing
+def get_npacked(args):
+	return int(math.ceil(args.ncommands/float(get_nruns(args))))
+
+def too_many_commands(args):
+	return args.ncommands > args.maxcommands
+
+def get_duration(the_time):
+	# Acceptable time formats include 
+	# "minutes", 
+	# "minutes:seconds", 
+	# "hours:minutes:seconds", 
+	# "days-hours", 
+	# "days-hours:minutes" and 
+	# "days-hours:minutes:seconds".
+	jobtime = the_time.split('-')
+	days    = 0
+	hours   = 0
+	minutes = 0
+	seconds = 0
+	if len(jobtime) == 2:
+		days    = int(jobtime[0])
+		jobtime = jobtime[1]
+	else:
+		jobtime = jobtime[0]
+	jobtime = jobtime.split(":")
+	if len(jobtime) == 1:
+		if days != 0:
+			minutes = jobtime[0]
+		else:
+			hours = jobtime[0]
+	elif len(jobtime) == 2:
+		if days != 0:
+			hours   = jobtime[0]
+			minutes = jobtime[1]
+		else:
+			minutes = jobtime[0]
+			seconds = jobtime[1]
+	else:
+		hours    = jobtime[0]
+		minutes  = jobtime[1]
+		seconds  = jobtime[2]
+	duration = timedelta(days = int(days), hours = int(hours), minutes = int(minutes), seconds = int(seconds))
+	return duration
+
+## formats a timedelta as d-hh:mm:ss for slurm
+def format_duration(duration):
+	hours, rest      = divmod(int(duration.total_seconds()) - duration.days * 86400, 3600)
+	minutes, seconds = divmod(rest, 60)
+	return str(duration.days) + "-%02d:%02d:%02d" % (hours, minutes, seconds)
+
+def get_new_duration(args):
+	NRUNS = get_nruns(args)
+	duration = get_duration(args.duration) * NRUNS
+	return format_duration(duration)
+
+## packed array jobs run their commands in rounds of -P at a time, each round taking up to --time
+def get_packed_duration(args):
+	rounds = int(math.ceil(get_nruns(args)/float(args.processors)))
+	duration = get_duration(args.time) * rounds
+	return format_duration(duration)
+
+########## the job registry: every submitted job's number, timestamp and name (rundir), in an
+########## SQLite database in the current directory, indexed by name. Each submission is logged in
+########## its own transaction, so parallel submissions (e.g. make -j) cannot interleave.
+########## The rollback journal is used rather than WAL, which does not work on network filesystems.
+########## The flat .slurm_array_jobnums of earlier versions is imported when the registry is created.
+SAJ   = ".slurm_array_jobnums"
+SAJDB = ".slurm_array_jobnums.db"
+
+def open_registry():
+	import sqlite3
+	conn = sqlite3.connect(SAJDB, timeout = 60)
+	conn.text_factory = str
+	conn.execute("CREATE TABLE IF NOT EXISTS jobs (jobnum TEXT NOT NULL, timestamp TEXT NOT NULL, name TEXT NOT NULL)")
+	conn.execute("CREATE INDEX IF NOT EXISTS jobs_name ON jobs (name)")
+	conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+	conn.commit()
+	imported = conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone()
+	if imported == None:
+		import_flat_registry(conn)
+	return conn
+
+## imports .slurm_array_jobnums (if there is one) into the registry, once
+def import_flat_registry(conn):
+	conn.execute("BEGIN IMMEDIATE")
+	if conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone() == None:
+		if os.path.isfile(SAJ):
+			fhandle = io.open(SAJ, "r")
+			for line in fhandle:
+				line_list = line.strip().split('\t')
+				if len(line_list) == 3:
+					jobnum = line_list[0].split('.')[0]
+					conn.execute("INSERT INTO jobs VALUES (?, ?, ?)", (jobnum, line_list[1], line_list[2]))
+			fhandle.close()
+		conn.execute("INSERT INTO meta VALUES ('imported', ?)", (SAJ,))
+	conn.commit()
+
+def register_job(jobnum, timestamp, name):
+	conn = open_registry()
+	conn.execute("INSERT INTO jobs VALUES (?, ?, ?)", (jobnum, timestamp, name))
+	conn.commit()
+	conn.close()
+
+def get_hold_jobs():
+	conn = open_registry()
+	jobslist = [row[0] for row in conn.execute("SELECT jobnum FROM jobs ORDER BY rowid")]
+	conn.close()
+	return jobslist
+
+## given a comma-sep list of job names (regular expressions), returns a python list of job numbers.
+## Each distinct name is matched once against the compiled patterns; the job numbers of the
+## matching names (sharded submissions log several under one name) are then looked up by index.
+def get_hold_jobs_by_names(names, purpose = "hold for"):
+	jobslist = list()
+	conn = open_registry()
+	prev_names = [row[0] for row in conn.execute("SELECT DISTINCT name FROM jobs")]
+
+	names_list = names.split(',')
+	for name in names_list:
+		pattern = re.compile(name)
+		found = False
+		for prev_name in prev_names:
+			if pattern.search(prev_name):
+				rows = conn.execute("SELECT jobnum FROM jobs WHERE name = ? ORDER BY rowid", (prev_name,))
+				jobslist.extend([row[0] for row in rows])
+				found = True
+
+		if not found:
+			sys.stderr.write("Warning: job " + name + " does not match any job name in " + SAJDB + "; cannot " + purpose + " this job.\n")
+
+	conn.close()
+	return jobslist
+
+########## make dir
+## An existing rundir is renamed aside (which is atomic, and quick even for a huge directory)
+## and deleted by a detached rm that carries on after we exit; or, with keep_old, it is kept
+## as <rundir>.1, <rundir>.2, etc.
+def make_rundir(rundir, keep_old = False):
+	if os.path.exists(rundir):
+		if keep_old:
+			version = 1
+			while os.path.exists(rundir + "." + str(version)):
+				version = version + 1
+			print("WARNING: logdir '" + rundir + "' exists; moving it to '" + rundir + "." + str(version) + "' and recreating it")
+			os.rename(rundir, rundir + "." + str(version))
+		else:
+			print("WARNING: deleting logdir '" + rundir + "' and recreating it")
+			trash = os.path.join(os.path.dirname(rundir), ".SLURM_Array_trash." + os.path.basename(rundir) + "." + str(os.getpid()))
+			os.rename(rundir, trash)
+			import subprocess
+			devnull = io.open(os.devnull, "r+b")
+			subprocess.Popen(["rm", "-rf", trash], stdin = devnull, stdout = devnull, stderr = devnull, close_fds = True, start_new_session = True)
+			devnull.close()
+	os.makedirs(rundir)
+
+
+########## note the version of GNU time the commands will be run with in rundir/time_version.txt
+## (the first line of time --version, e.g. "time (GNU Time) 1.9"), so that --report knows whether
+## it overreports memory. Nothing is written if there is no GNU time here.
+TIME_VERSION_FILE = "time_version.txt"
+TIME_VERSION      = re.compile(r"GNU [Tt]ime\)?\s+(\d+)\.(\d+)")
+
+def record_time_version(rundir):
+	import subprocess
+	try:
+		output = subprocess.check_output(["/usr/bin/env", "time", "--version"], stderr = subprocess.STDOUT).decode("utf-8", "replace")
+	except (subprocess.CalledProcessError, OSError):
+		return
+	if TIME_VERSION.search(output) != None:
+		versionh = io.open(rundir + "/" + TIME_VERSION_FILE, "w")
+		versionh.write(output.strip().split("\n")[0] + "\n")
+		versionh.close()
+
+
+########## write commands.txt, and commands.idx alongside it; returns the number of commands
+## commands.idx holds one fixed-width record per command: the zero-padded byte offset
+## of that command's line in commands.txt. Array tasks seek straight to record N
+## (N * IDX_RECORD bytes in) instead of scanning commands.txt for line N.
+## cmds can be any iterable of lines (such as a file); blank lines are skipped, and the
+## commands are written out WRITE_CHUNK lines at a time. If annotated is a dictionary, the
+## commands with resource annotations (see plan_classes) go in it, by command number.
+IDX_DIGITS  = 16
+IDX_RECORD  = IDX_DIGITS + 1
+WRITE_CHUNK = 65536
+
+def write_commands(cmds, rundir, annotated = None):
+	commandsh = io.open(rundir + "/commands.txt", "wb")
+	indexh    = io.open(rundir + "/commands.idx", "wb")
+	offset    = 0
+	ncmds     = 0
+	cmdchunk  = list()
+	idxchunk  = list()
+	for cmd in cmds:
+		if cmd.strip() == b"":
+			continue
+		cmd = cmd.rstrip(b"\n")
+		if annotated != None and b"#@" in cmd:
+			annotated[ncmds] = cmd
+		idxchunk.append(str(offset).zfill(IDX_DIGITS) + "\n")
+		cmdchunk.append(cmd + b"\n")
+		offset = offset + len(cmd) + 1
+		ncmds  = ncmds + 1
+		if len(cmdchunk) == WRITE_CHUNK:
+			commandsh.write(b"".join(cmdchunk))
+			indexh.write("".join(idxchunk).encode("ascii"))
+			cmdchunk = list()
+			idxchunk = list()
+	commandsh.write(b"".join(cmdchunk))
+	indexh.write("".join(idxchunk).encode("ascii"))
+	indexh.close()
+	commandsh.close()
+	return ncmds
+
+## bash function for the submit script that prints command number $1 (counting from 0)
+## by seeking through commands.idx; prints nothing if there is no such command
+def write_getcmd(scripth, rundir):
+	scripth.write("# Look up a command by its number (from 0): seek to its record in commands.idx, \n")
+	scripth.write("# then seek to the byte offset it holds in commands.txt and print that line. \n")
+	scripth.write("getcmd() {\n")
+	scripth.write("	local offset=`dd if=" + rundir + "/commands.idx bs=" + str(IDX_RECORD) + " skip=$1 count=1 2>/dev/null`\n")
+	scripth.write("	if [ -n \"${offset}\" ] ; then\n")
+	scripth.write("		tail -c +$((10#${offset} + 1)) " + rundir + "/commands.txt 2>/dev/null | head -n 1\n")
+	scripth.write("	fi\n")
+	scripth.write("}\n")
+
+
+## bash function for the submit script that records the exit status ($2) of command number $1
+## (the command itself is $3) in completed.tsv, with an md5 hash of the command for --resume.
+## Array jobs append to completed.tsv under a shared lock.
+def write_record(scripth, rundir):
+	scripth.write("# Record the exit status of a command, with a hash of the command, in completed.tsv \n")
+	scripth.write("record() {\n")
+	scripth.write("	local hash=`printf '%s' \"$3\" | md5sum | cut -c 1-32`\n")
+	scripth.write("	(\n")
+	scripth.write("		flock -x 9 || exit 1\n")
+	scripth.write("		echo \"${hash}	$2	$1\" >> " + rundir + "/completed.tsv\n")
+	scripth.write("	) 9>> " + rundir + "/completed.lock\n")
+	scripth.write("}\n")
+
+## bash function for the submit script of a --resume, which runs only some of the commands:
+## prints the number of the command that task number $1 runs, from the resume's index.
+## The index is fixed-width like commands.idx, but holds command numbers rather than offsets.
+def write_getnum(scripth, args):
+	scripth.write("# This resubmission runs only some of the commands: task number $1 runs the command \n")
+	scripth.write("# whose number is in record $1 of " + args.selection + " \n")
+	scripth.write("getnum() {\n")
+	scripth.write("	local num=`dd if=" + args.rundir + "/" + args.selection + " bs=" + str(IDX_RECORD) + " skip=$1 count=1 2>/dev/null`\n")
+	scripth.write("	if [ -n \"${num}\" ] ; then\n")
+	scripth.write("		echo $((10#${num}))\n")
+	scripth.write("	fi\n")
+	scripth.write("}\n")
+
+## the shell expression for the number of the command that a task runs: the task's own number,
+## or for --resume, the command number the resume's index holds for it
+def command_number(args, number):
+	if args.selection == None or direct_selection(args):
+		return number
+	return "`getnum " + number + "`"
+
+## whether the array tasks of a run of only some of the commands can simply be numbered by the
+## numbers of the commands they run (--array=2,5-9,...), so that their logs are too; this is only
+## done when there is one command per array task, and every command number is a valid task number
+def direct_selection(args):
+	return args.selection != None and args.pack == 0 and not too_many_commands(args) and args.ntotal <= args.maxcommands
+
+## the command numbers in the index args.selection
+def read_selection(args):
+	selectionh = io.open(args.rundir + "/" + args.selection, "r")
+	numbers = [int(line) for line in selectionh]
+	selectionh.close()
+	return numbers
+
+## a list of array task numbers in the form of sbatch --array, e.g. [0, 1, 2, 5, 7, 8] as 0-2,5,7-8
+def format_array(numbers):
+	ranges = list()
+	for number in numbers:
+		if len(ranges) > 0 and ranges[-1][1] == number - 1:
+			ranges[-1][1] = number
+		else:
+			ranges.append([number, number])
+	return ",".join([str(first) if first == last else str(first) + "-" + str(last) for first, last in ranges])
+
+## the array task numbers in an sbatch --array list, such as 0-2,5,7-8%50
+def expand_array(spec):
+	numbers = list()
+	for part in spec.split("%")[0].split(","):
+		bounds = part.split("-")
+		numbers.extend(range(int(bounds[0]), int(bounds[-1]) + 1))
+	return numbers
+
+
+## bash function for the submit script that claims the next unstarted command number
+## for --dynamic. The counter in claim.next is read and bumped under an exclusive flock
+## on claim.lock, which is safe across nodes on NFS (and on Lustre mounted with -o flock).
+## A script that runs only some of the commands (a resource class, or a --resume) counts
+## through its own index, so has a counter of its own: claim.<index>.next.
+def write_claimnext(scripth, args):
+	rundir  = args.rundir
+	counter = "claim.next"
+	if args.selection != None:
+		counter = "claim." + args.selection.split(".")[0] + ".next"
+	counterh = io.open(rundir + "/" + counter, "w")
+	counterh.write("0\n")
+	counterh.close()
+	scripth.write("# Claim the next unstarted command: read and bump the shared counter in " + counter + " \n")
+	scripth.write("# while holding an exclusive lock on claim.lock. \n")
+	scripth.write("claimnext() {\n")
+	scripth.write("	(\n")
+	scripth.write("		flock -x 9 || exit 1\n")
+	scripth.write("		local next=`cat " + rundir + "/" + counter + " 2>/dev/null`\n")
+	scripth.write("		next=${next:-0}\n")
+	scripth.write("		echo $((next + 1)) > " + rundir + "/" + counter + "\n")
+	scripth.write("		echo ${next}\n")
+	scripth.write("	) 9>> " + rundir + "/claim.lock\n")
+	scripth.write("}\n")
+	scripth.write("# \n")
+
+
+## runs a command through GNU time, reporting memory and such on stderr
+TIME_COMMAND = "/usr/bin/env time -f \" \\\\tFull Command:                      %C \\\\n\\\\tMemory (kb):                       %M \\\\n\\\\t# SWAP  (freq):                    %W \\\\n\\\\t# Waits (freq):                    %w \\\\n\\\\tCPU (percent):                     %P \\\\n\\\\tTime (seconds):                    %e \\\\n\\\\tTime (hh:mm:ss.ms):                %E \\\\n\\\\tSystem CPU Time (seconds):         %S \\\\n\\\\tUser   CPU Time (seconds):         %U \""
+
+## bash function for --onelog that runs command number $1 (the command itself is $2) through time,
+## straight from the command line rather than from a command file. Its stdout and stderr are
+## captured on local disk, then appended to the array job's log as framed records
+##   ==> SLURM_Array record <command number> <out|err> <length in bytes> <==
+## each followed by the output and a newline. Where each record starts is noted in onelog.idx as
+##   <log file> <command number> <out|err> <byte offset>
+## All of this is done under a lock shared by the array jobs, as packed commands share a log.
+def write_runlogged(scripth, rundir):
+	jobname = os.path.basename(rundir)
+	scripth.write("# Run command number $1 (the command is $2) through time with memory and such reporting, \n")
+	scripth.write("# and append its stdout and stderr to this array job's log as framed records. \n")
+	scripth.write("# warning: GNU time before 1.8 overreports memory usage by 4x; --report \n")
+	scripth.write("# corrects for this by the version noted in " + TIME_VERSION_FILE + ". \n")
+	scripth.write("runlogged() {\n")
+	scripth.write("	local tmp=`mktemp -d ${TMPDIR:-/tmp}/SLURM_Array.XXXXXX`\n")
+	scripth.write("	" + TIME_COMMAND + " \\\n")
+	scripth.write("	bash -c \"$2\" > ${tmp}/out 2> ${tmp}/err\n")
+	scripth.write("	local status=$?\n")
+	scripth.write("	local log=" + rundir + "/" + jobname + ".${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}.log\n")
+	scripth.write("	(\n")
+	scripth.write("		flock -x 9 || exit 1\n")
+	scripth.write("		for stream in out err ; do\n")
+	scripth.write("			local offset=`stat -c %s ${log} 2>/dev/null || echo 0`\n")
+	scripth.write("			echo \"==> SLURM_Array record $1 ${stream} `stat -c %s ${tmp}/${stream}` <==\" >> ${log}\n")
+	scripth.write("			cat ${tmp}/${stream} >> ${log}\n")
+	scripth.write("			echo >> ${log}\n")
+	scripth.write("			echo \"`basename ${log}` $1 ${stream} ${offset}\" >> " + rundir + "/onelog.idx\n")
+	scripth.write("		done\n")
+	scripth.write("	) 9>> " + rundir + "/onelog.lock\n")
+	scripth.write("	rm -rf ${tmp}\n")
+	scripth.write("	return ${status}\n")
+	scripth.write("}\n")
+	scripth.write("export -f getcmd runlogged\n")
+
+## the body of the submit script for --pack: each array job runs its pack of commands as
+## background processes, at most SLURM_CPUS_PER_TASK at a time. Every command gets its own
+## command file and .out/.err, named by its command number as <jobname>.<jobid>_cmd<N>, so that
+## they can't be taken for the array job's own <jobname>.<jobid>_<task>.out and .err.
+def write_packed(scripth, args, NRUNS):
+	jobname = os.path.basename(args.rundir)
+	cmdname = "${SLURM_ARRAY_JOB_ID}_cmd${i}"
+	outfile = args.rundir + "/command." + jobname + "." + cmdname + ".txt"
+	scripth.write("# \n")
+	scripth.write("echo \"  Started on:           \" `/bin/hostname -s` \n")
+	scripth.write("echo \"  Started at:           \" `/bin/date` \n")
+	scripth.write("# Run the commands through time with memory and such reporting. \n")
+	scripth.write("# warning: GNU time before 1.8 overreports memory usage by 4x; --report \n")
+	scripth.write("# corrects for this by the version noted in " + TIME_VERSION_FILE + ". \n")
+	scripth.write("# \n")
+	scripth.write("# This array job runs a pack of npack commands, nprocs at a time. \n")
+	scripth.write("npack=" + str(NRUNS) + "\n")
+	scripth.write("nprocs=${SLURM_CPUS_PER_TASK:-" + str(args.processors) + "}\n")
+	scripth.write("running=0\n")
+	scripth.write("for (( c = 0; c < npack; c++ )) ; do\n")
+	scripth.write("	i=" + command_number(args, "$((SLURM_ARRAY_TASK_ID * npack + c))") + "\n")
+	scripth.write("	# Use the commands.idx index to grab a line from commands.txt\n")
+	scripth.write("	cmdcmd=`getcmd ${i}`\n")
+	scripth.write("	if [ -z \"${cmdcmd}\" ] ; then\n")
+	scripth.write("		# the last pack can be short\n")
+	scripth.write("		break\n")
+	scripth.write("	fi\n")
+	scripth.write("	{\n")
+	if not args.onelog:
+		scripth.write("		echo \\#!/usr/bin/env bash > " + outfile + "\n")
+		scripth.write("		echo $cmdcmd >> " + outfile + "\n")
+		scripth.write("		chmod u+x " + outfile + "\n")
+		scripth.write("		" + TIME_COMMAND + " \\\n")
+		scripth.write("		" + outfile + " \\\n")
+		scripth.write("		> " + args.rundir + "/" + jobname + "." + cmdname + ".out \\\n")
+		scripth.write("		2> " + args.rundir + "/" + jobname + "." + cmdname + ".err\n")
+	else:
+		scripth.write("		runlogged ${i} \"${cmdcmd}\"\n")
+	scripth.write("		record ${i} $? \"${cmdcmd}\"\n")
+	scripth.write("	} &\n")
+	scripth.write("	running=$((running + 1))\n")
+	scripth.write("	# once all processors are busy, wait for a command to finish before starting another\n")
+	scripth.write("	if [ ${running} -ge ${nprocs} ] ; then\n")
+	scripth.write("		wait -n\n")
+	scripth.write("		running=$((running - 1))\n")
+	scripth.write("	fi\n")
+	scripth.write("done\n")
+	scripth.write("wait\n")
+	scripth.write("echo \"  Finished at:           \" `date` \n")
+
+
+## the job numbers to hold for, from .slurm_array_jobnums.db and --hold_jid
+def get_holdfor(args):
+	holdfor = list()
+	if args.hold_name_list != None:
+		prev_jobs = get_hold_jobs_by_names(args.hold_name_list)
+		holdfor.extend(prev_jobs)
+	if args.hold_jid_list != None:           # hold for specific jobs
+		holdfor.append(args.hold_jid_list)
+	if args.hold:                            # hold for all previous jobs
+		prev_jobs = get_hold_jobs()
+		holdfor.extend(prev_jobs)
+	return holdfor
+
+## splits the commands into shards of at most maxcommands for --shard; returns a list of
+## (shard number, number of the shard's first command, number of commands in the shard)
+def get_shards(args):
+	shards = list()
+	ncmds  = args.ncommands
+	for offset in range(0, ncmds, args.maxcommands):
+		shards.append((len(shards), offset, min(args.maxcommands, ncmds - offset)))
+	return shards
+
+########## resource classes: memory, processors and time for each command
+## A command can ask for its own resources with an annotation at the end of its line, e.g.
+##   runAssembly big_sample.fasta -o big_sample.out #@ mem=64gb cpus=8 time=1-00:00:00
+## (a comment to bash, so it is left in commands.txt). The commands are grouped into classes by
+## the resources they ask for, with the command line's for those they don't, and each class is
+## submitted as its own array job, running just its commands through an index like that of --resume
+## (class<K>.idx). All of the classes are logged under the same job name, and the commands keep
+## their numbers: in completed.tsv and the logs, it is as though they were run as one array job.
+RESOURCE_ANNOTATION = re.compile(rb"\s#@((?:\s+[A-Za-z]+=\S+)+)\s*$")
+RESOURCE_OPTIONS    = {"mem": "memory", "cpus": "processors", "time": "time"}
+
+## the (memory, processors, time) that command number number asks for
+def get_resources(args, number, cmd):
+	resources = {"memory": args.memory, "processors": str(args.processors), "time": args.time}
+	match = RESOURCE_ANNOTATION.search(cmd)
+	if match != None:
+		annotation = match.group(1).decode("utf-8", "replace").strip()
+		for setting in annotation.split():
+			key, value = setting.split("=", 1)
+			if key not in RESOURCE_OPTIONS:
+				raise SlurmArrayError("command " + str(number) + " asks for '" + key + "'; the resources that can be asked for are " + ", ".join(sorted(RESOURCE_OPTIONS.keys())) + ".")
+			resources[RESOURCE_OPTIONS[key]] = value
+		try:
+			get_size(resources["memory"])
+			int(resources["processors"])
+			get_duration(resources["time"])
+		except ValueError:
+			raise SlurmArrayError("command " + str(number) + " asks for resources that can't be read: " + annotation)
+	return (resources["memory"], resources["processors"], resources["time"])
+
+## groups the commands (those of args.selection, when resuming) into resource classes, and writes
+## the index of each; returns the options for each class, or None if they all ask for the same
+## resources (which are then set in args)
+def plan_classes(args):
+	import copy
+	annotated = getattr(args, "annotated", None)
+	args.annotated = None
+	if not annotated:
+		return None
+	default = (args.memory, str(args.processors), args.time)
+	members = dict()
+	for number in sorted(annotated.keys()):
+		resources = get_resources(args, number, annotated[number])
+		if resources != default:
+			members.setdefault(resources, list()).append(number)
+	if len(members) == 0:
+		return None
+
+	if args.selection != None:
+		candidates = read_selection(args)
+		prefix = args.selection.split(".")[0] + "_class"
+	else:
+		candidates = range(args.ncommands)
+		prefix = "class"
+	classed  = set()
+	for numbers in members.values():
+		classed.update(numbers)
+	others   = [number for number in candidates if number not in classed]
+	classes  = list()
+	if len(others) > 0:
+		classes.append((default, others))
+	classes.extend(sorted(members.items(), key = lambda item: item[1][0]))
+	if len(classes) == 1:
+		args.memory, args.processors, args.time = classes[0][0]
+		return None
+
+	classes_args = list()
+	for k, (resources, numbers) in enumerate(classes):
+		class_args = copy.copy(args)
+		class_args.memory, class_args.processors, class_args.time = resources
+		class_args.selection = prefix + str(k + 1) + ".idx"
+		class_args.ncommands = len(numbers)
+		selectionh = io.open(args.rundir + "/" + class_args.selection, "w")
+		for number in numbers:
+			selectionh.write(str(number).zfill(IDX_DIGITS) + "\n")
+		selectionh.close()
+		print("Resource class " + str(k + 1) + ": " + str(len(numbers)) + " commands with --mem=" + class_args.memory + " --cpus-per-task=" + class_args.processors + " --time=" + class_args.time + " (" + class_args.selection + ")")
+		classes_args.append(class_args)
+	return classes_args
+
+########## write the qsub scripts; returns the list of scripts to submit, in order
+def write_qsubs(args, holdfor = None):
+	if holdfor == None:
+		holdfor = get_holdfor(args)
+	classes = plan_classes(args)
+	if classes != None:
+		scripts = list()
+		for class_args in classes:
+			scripts.extend(write_qsubs(class_args, holdfor))
+		return scripts
+	if args.shard and args.pack == 0 and too_many_commands(args):
+		scripts = list()
+		for shard in get_shards(args):
+			scripts.append(write_qsub(args, holdfor, shard))
+		return scripts
+	return [write_qsub(args, holdfor)]
+
+########## write the qsub script to args.rundir/args.rundir.sh, or args.rundir/args.rundir.shard<N>.sh
+########## for the given shard; returns its path
+def write_qsub(args, holdfor, shard = None):
+	jobname    = os.path.basename(args.rundir)
+	scriptbase = args.rundir + "/" + jobname
+	if args.selection != None:
+		scriptbase = scriptbase + "." + args.selection.split(".")[0]
+	scriptname = scriptbase + ".sh"
+	if shard != None:
+		scriptname = scriptbase + ".shard" + str(shard[0]) + ".sh"
+	scripth    = io.open(scriptname, "w")
+	NRUNS      = get_nruns(args)
+
+
+	scripth.write(textwrap.dedent('''\
+		#!/usr/bin/env bash
+		#
+		# This file created by SLURM_Array
+		#
+		# \n'''))
+	scripth.write("# Set job name \n")
+	scripth.write("#SBATCH --job-name=" + str(jobname) + "\n")
+	scripth.write("# \n")
+
+	scripth.write("# Set job time \n")
+	if args.pack > 0:
+		scripth.write("#SBATCH --time=" + get_packed_duration(args) + "\n")
+		scripth.write("# \n")
+		scripth.write("# Set array job range (0 to number of packs of " + str(NRUNS) + " commands (minus 1)) and concurrency (%N) \n")
+		scripth.write("#SBATCH --array=0-" + str(get_npacked(args) - 1) + "%" + str(args.concurrency) + "\n")
+		scripth.write("# \n")
+	elif shard != None:
+		concurrency = max(1, int(args.concurrency) // len(get_shards(args)))
+		scripth.write("#SBATCH --time=" + args.time + "\n")
+		scripth.write("# \n")
+		scripth.write("# Set array job range (0 to number of commands in shard " + str(shard[0]) + " (minus 1)) and concurrency (%N) \n")
+		scripth.write("#SBATCH --array=0-" + str(shard[2] - 1) + "%" + str(concurrency) + "\n")
+		scripth.write("# \n")
+	elif direct_selection(args):
+		scripth.write("#SBATCH --time=" + args.time + "\n")
+		scripth.write("# \n")
+		scripth.write("# Set array job range (the numbers of the commands in " + args.selection + ") and concurrency (%N) \n")
+		scripth.write("#SBATCH --array=" + format_array(read_selection(args)) + "%" + str(args.concurrency) + "\n")
+		scripth.write("# \n")
+	elif not too_many_commands(args):
+		scripth.write("#SBATCH --time=" + args.time + "\n")
+		scripth.write("# \n")
+		scripth.write("# Set array job range (0 to number of commands in cmd file (minus 1)) and concurrency (%N) \n")
+		scripth.write("#SBATCH --array=0-" + str(args.ncommands - 1) + "%" + str(args.concurrency) + "\n")
+		scripth.write("# \n")
+	else:
+		scripth.write("#SBATCH --time=" + get_new_duration(args) + "\n")
+		scripth.write("# \n")
+		scripth.write("# Set array job range (0 to number of commands in cmd file (minus 1)) and concurrency (%N) \n")
+		scripth.write("#SBATCH --array=0-" + str(args.maxcommands - 1) + "\n")
+		scripth.write("# \n")
+
+	if not args.onelog:
+		scripth.write("# Output files for stdout and stderr \n")
+		scripth.write("#SBATCH --output=" + args.rundir + "/" + jobname + ".%A_%a.out\n")
+		scripth.write("#SBATCH --error=" + args.rundir + "/" + jobname + ".%A_%a.err\n")
+		scripth.write("# \n")
+	else:
+		scripth.write("# One log file for stdout and stderr of the array job and all of its commands; \n")
+		scripth.write("# appended to, because the commands' records are appended to it as well \n")
+		scripth.write("#SBATCH --output=" + args.rundir + "/" + jobname + ".%A_%a.log\n")
+		scripth.write("#SBATCH --error=" + args.rundir + "/" + jobname + ".%A_%a.log\n")
+		scripth.write("#SBATCH --open-mode=append\n")
+		scripth.write("# \n")
+
+	if args.queue != None:
+		scripth.write("# Set partitions to use \n")
+		scripth.write("#SBATCH --partition=" + str(args.queue) + "\n")
+		scripth.write("# \n")
+
+	# if holding...
+	if len(holdfor) > 0:                    # if there's anything to hold for, actually do a hold ;)
+		scripth.write("# Hold for these job numbers, from .slurm_array_jobnums.db and --hold_jid \n")
+		scripth.write("#SBATCH --dependency=afterany:" + ":".join(holdfor) + "\n")
+		scripth.write("# \n")
+	if args.HOLD:
+		scripth.write("# Hold this job until released by scontrol release <JOBID> \n")
+		scripth.write("#SBATCH -H \n")
+		scripth.write("# \n")
+
+	scripth.write("# Set memory requested and max memory \n")
+	scripth.write("#SBATCH --mem=" + str(args.memory) + "\n")
+
+	scripth.write("# \n")
+	
+	scripth.write("# Request some processors \n")
+	scripth.write("#SBATCH --cpus-per-task=" + str(args.processors) + "\n")
+	if args.pack > 0 or shard != None or not too_many_commands(args):
+		scripth.write("#SBATCH --ntasks=1\n")
+	scripth.write("# \n")
+	
+	if args.wd != None:
+		scripth.write("# Set working directory \n")
+		scripth.write("#SBATCH --workdir=" + args.wd + "\n")
+		scripth.write("# \n")
+
+	if args.mail != None:
+		scripth.write("# Email \n")
+		scripth.write("#SBATCH --mail-user=" + str(args.mail) + "\n")
+		scripth.write("# Email Type\n")
+		scripth.write("#SBATCH --mail-type=" + str(args.mailtype) + "\n")
+	
+	scripth.write("# Loading specified modules\n")
+	scripth.write("# \n")
+	if len(args.module) > 0:
+		for i in args.module:
+			scripth.write("module load " + i + "\n")
+	scripth.write("# \n")
+	write_getcmd(scripth, args.rundir)
+	write_record(scripth, args.rundir)
+	if args.selection != None and not direct_selection(args):
+		write_getnum(scripth, args)
+	if args.onelog:
+		write_runlogged(scripth, args.rundir)
+	if args.pack > 0:
+		write_packed(scripth, args, NRUNS)
+	elif shard != None or not too_many_commands(args):
+		jobsuffix  = ".${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}.txt\n"
+		outfile = args.rundir + "/command." + jobname + jobsuffix
+		scripth.write("# \n")
+		scripth.write("echo \"  Started on:           \" `/bin/hostname -s` \n")
+		scripth.write("echo \"  Started at:           \" `/bin/date` \n")
+
+		scripth.write("# Run the command through time with memory and such reporting. \n")
+		scripth.write("# warning: GNU time before 1.8 overreports memory usage by 4x; --report \n")
+		scripth.write("# corrects for this by the version noted in " + TIME_VERSION_FILE + ". \n")
+		if shard == None:
+			scripth.write("i=" + command_number(args, "$SLURM_ARRAY_TASK_ID") + "\n")
+		else:
+			scripth.write("# This shard runs commands shard_offset and up \n")
+			scripth.write("shard_offset=" + str(shard[1]) + "\n")
+			scripth.write("i=" + command_number(args, "$((shard_offset + SLURM_ARRAY_TASK_ID))") + "\n")
+		scripth.write("cmdcmd=`getcmd ${i}`\n")
+		if not args.onelog:
+			scripth.write("echo \#!/usr/bin/env bash > " + outfile)
+			scripth.write("echo $cmdcmd >> " + outfile)
+			scripth.write("chmod u+x " + outfile)
+			scripth.write(TIME_COMMAND + " \\\n")
+			scripth.write(outfile)
+		else:
+			scripth.write("runlogged ${i} \"${cmdcmd}\"\n")
+		scripth.write("record ${i} $? \"${cmdcmd}\"\n")
+		scripth.write("echo \"  Finished at:           \" `date` \n")
+	else:
+		jobsuffix  = ".%A_%a_%s"
+		outfile = args.rundir + "/command." + jobname + ".${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}_${c}.txt\n"
+		scripth.write("# \n")
+		scripth.write("echo \"  Started on:           \" `/bin/hostname -s` \n")
+		scripth.write("echo \"  Started at:           \" `/bin/date` \n")
+		scripth.write("# Run the command through time with memory and such reporting. \n")
+		scripth.write("# warning: GNU time before 1.8 overreports memory usage by 4x; --report \n")
+		scripth.write("# corrects for this by the version noted in " + TIME_VERSION_FILE + ". \n")
+		scripth.write("# \n")
+		scripth.write("# This script is running an array that will submit scripts serially. \n")
+		if not args.dynamic:
+			scripth.write("# The number of steps is defined by the nsteps variable \n")
+			scripth.write("nsteps=" + str(NRUNS) + "\n")
+			scripth.write("for (( c = 0; c < nsteps; c++ )) ; do\n")
+			scripth.write("	i=" + command_number(args, "$((SLURM_ARRAY_TASK_ID * nsteps + c))") + "\n")
+		else:
+			write_claimnext(scripth, args)
+			scripth.write("# Each array job claims commands until all ncmds of them have been claimed \n")
+			scripth.write("ncmds=" + str(args.ncommands) + "\n")
+			scripth.write("c=0\n")
+			scripth.write("while i=`claimnext` && [ ${i} -lt ${ncmds} ] ; do\n")
+			if args.selection != None:
+				scripth.write("	i=" + command_number(args, "${i}") + "\n")
+		scripth.write("	# Use the commands.idx index to grab a line from commands.txt\n")
+		scripth.write("	cmdcmd=`getcmd ${i}`\n")
+		scripth.write("	if [ -n \"${cmdcmd}\" ] ; then\n")
+		if args.onelog:
+			write_srun_logged(scripth, args)
+		else:
+			write_srun(scripth, args, jobsuffix, outfile)
+		scripth.write("		record ${i} $? \"${cmdcmd}\"\n")
+		scripth.write("	else\n\t\techo \"Line $((1 + i)) missing from commands.txt, skipping\"\n")
+		scripth.write("	fi\n")
+		if args.dynamic:
+			scripth.write("	c=$((c + 1))\n")
+		scripth.write("done\n")
+		scripth.write("echo \"  Finished at:           \" `date` \n")
+			
+	scripth.close()
+	return scriptname
+
+## runs a command from the maxcommands loop as a job step, through a command file and with its own .out and .err
+def write_srun(scripth, args, jobsuffix, outfile):
+	jobname = os.path.basename(args.rundir)
+	# Writing to outfile
+	scripth.write("		# Write script to text file, recording the host, and start and end time. \n")
+	scripth.write("		printf '#!/usr/bin/env bash\\n' > " + outfile)
+	scripth.write("		printf 'echo \"  Started on:           \" `/bin/hostname -s` \\n' >> " + outfile)
+	scripth.write("		printf 'echo \"  Started at:           \" `/bin/date` \\n' >> " + outfile)
+	scripth.write("		echo $cmdcmd >> " + outfile)
+	scripth.write("		printf 'echo \"  Finished at:           \" `date` \\n' >> " + outfile)
+	scripth.write("		# Make the file executable\n")
+	scripth.write("		chmod u+x " + outfile + "\n")
+	scripth.write("		# Run the command in this Slurm array job allocation in a separate\n")
+	scripth.write("		# Slurm job step\n")
+	scripth.write("		# --------------------------------------------------------------\n")
+	# Running the command
+	scripth.write("		srun \\\n")
+	scripth.write("		--mem=" + args.memory + " \\\n")
+	scripth.write("		--time=" + args.time + " \\\n")
+	scripth.write("		--cpus-per-task=" + args.processors + " \\\n")
+	scripth.write("		--ntasks=1 \\\n")
+	scripth.write("		--output=" + args.rundir + "/" + jobname + jobsuffix + ".out \\\n")
+	scripth.write("		--error="  + args.rundir + "/" + jobname + jobsuffix + ".err \\\n")
+	scripth.write("		" + TIME_COMMAND + " \\\n")
+	scripth.write("		" + outfile)
+
+## runs a command from the maxcommands loop as a job step, logging its output to the array job's log
+def write_srun_logged(scripth, args):
+	scripth.write("		# Run the command in this Slurm array job allocation in a separate\n")
+	scripth.write("		# Slurm job step; runlogged appends its output to this array job's log\n")
+	scripth.write("		# --------------------------------------------------------------\n")
+	scripth.write("		export i cmdcmd\n")
+	scripth.write("		srun \\\n")
+	scripth.write("		--mem=" + args.memory + " \\\n")
+	scripth.write("		--time=" + args.time + " \\\n")
+	scripth.write("		--cpus-per-task=" + args.processors + " \\\n")
+	scripth.write("		--ntasks=1 \\\n")
+	scripth.write("		--output=/dev/null \\\n")
+	scripth.write("		--error=/dev/null \\\n")
+	scripth.write("		bash -c 'runlogged ${i} \"${cmdcmd}\"'\n")
+
+
+
+########## --resume: resubmit the commands of a rundir that have not completed successfully
+## Writes resume<N>.idx, a fixed-width index of the numbers of the commands to run again, sets
+## args.selection to it and args.ntotal to the number of commands, and returns the number to run
+## again (0, writing nothing, if there is nothing to resume). The ones with resource annotations
+## go in args.annotated.
+def plan_resume(args):
+	import hashlib
+	done = set()
+	if os.path.isfile(args.rundir + "/completed.tsv"):
+		completedh = io.open(args.rundir + "/completed.tsv", "r")
+		for line in completedh:
+			line_list = line.split("\t")
+			if len(line_list) == 3 and line_list[1] == "0":
+				done.add(line_list[0])
+		completedh.close()
+
+	nresumes = len([name for name in os.listdir(args.rundir) if re.match(r"^resume\d+\.idx$", name)])
+	args.selection = "resume" + str(nresumes + 1) + ".idx"
+	commandsh  = io.open(args.rundir + "/commands.txt", "rb")
+	selectionh = io.open(args.rundir + "/" + args.selection, "w")
+	ncmds      = 0
+	npending   = 0
+	for cmd in commandsh:
+		cmd = cmd.rstrip(b"\n")
+		if hashlib.md5(cmd).hexdigest() not in done:
+			selectionh.write(str(ncmds).zfill(IDX_DIGITS) + "\n")
+			npending = npending + 1
+			if b"#@" in cmd:
+				args.annotated[ncmds] = cmd
+		ncmds = ncmds + 1
+	selectionh.close()
+	commandsh.close()
+	args.ntotal = ncmds
+	record_time_version(args.rundir)
+
+	print("Resuming " + str(npending) + " of the " + str(ncmds) + " commands in " + args.rundir + "; the other " + str(ncmds - npending) + " completed successfully.")
+	if npending == 0:
+		os.remove(args.rundir + "/" + args.selection)
+	return npending
+
+
+########## --extract: get the output of one command of a --onelog run back
+ONELOG_HEADER = re.compile(r"^==> SLURM_Array record (\d+) (out|err) (\d+) <==$")
+
+## returns a dictionary with the "out" and "err" of command number index; if the command
+## was run more than once, the records appended last are used
+def read_onelog(rundir, index):
+	records = dict()
+	indexh  = io.open(rundir + "/onelog.idx", "r")
+	for line in indexh:
+		line_list = line.split()
+		if len(line_list) == 4 and int(line_list[1]) == index:
+			records[line_list[2]] = (line_list[0], int(line_list[3]))
+
+	output = dict()
+	for stream in records.keys():
+		logname, offset = records[stream]
+		logh = io.open(rundir + "/" + logname, "rb")
+		logh.seek(offset)
+		header = ONELOG_HEADER.match(logh.readline().decode("ascii", "replace").rstrip("\n"))
+		output[stream] = logh.read(int(header.group(3)))
+		logh.close()
+	return output
+
+def extract_onelog(rundir, index):
+	output = read_onelog(rundir, index)
+	if len(output) == 0:
+		raise SlurmArrayError("no output for command " + str(index) + " in " + rundir + "/onelog.idx")
+	sys.stdout.flush()
+	sys.stdout.buffer.write(output.get("out", b""))
+	sys.stdout.buffer.flush()
+	sys.stderr.buffer.write(output.get("err", b""))
+
+
+########## --report: harvest the time reports from the logs in a rundir into rundir/report.csv
+## Each report is one row; log files without a report get a row with empty measurements,
+## so that the size and mtime recorded for every file let later runs skip unchanged files.
+REPORT_FIELDS  = ["file", "size", "mtime", "jobid", "task", "step", "exit", "mem_kb", "cpu_percent", "elapsed_s", "system_s", "user_s"]
+TIME_FIELDS    = [("Memory (kb):", "mem_kb"), ("CPU (percent):", "cpu_percent"), ("Time (seconds):", "elapsed_s"), ("System CPU Time (seconds):", "system_s"), ("User   CPU Time (seconds):", "user_s")]
+# <jobname>.<jobid>_<task>[_<step>], or <jobname>.<jobid>_cmd<N> for a command of a --pack
+LOG_NAME       = re.compile(r"\.(\d+)_(?:cmd)?(\d+)(?:_(\d+))?\.(?:err|out|log)$")
+# the reports are at the end of the logs, so only this much of each is read
+REPORT_TAIL    = 65536
+# GNU time before 1.8 reports 4x the memory actually used
+MEM_OVERREPORT = 4
+
+## reads the time reports at the end of one log file; returns a list of rows
+def parse_time_reports(path):
+	stat  = os.stat(path)
+	match = LOG_NAME.search(path)
+	base  = {"file": os.path.basename(path), "size": str(stat.st_size), "mtime": repr(stat.st_mtime), "jobid": match.group(1), "task": match.group(2), "step": match.group(3) or ""}
+	logh  = io.open(path, "rb")
+	if not path.endswith(".log"):
+		# --onelog logs have a report for each of their commands, so are read in full
+		logh.seek(max(0, stat.st_size - REPORT_TAIL))
+	lines = logh.read().decode("utf-8", "replace").split("\n")
+	logh.close()
+
+	rows   = list()
+	status = "0"
+	row    = None
+	for line in lines:
+		line = line.strip()
+		if line.startswith("Command exited with non-zero status"):
+			status = line.split()[-1]
+		elif line.startswith("Command terminated by signal"):
+			status = "signal " + line.split()[-1]
+		elif line.startswith("Full Command:"):
+			row = dict(base)
+			row["exit"] = status
+			rows.append(row)
+			status = "0"
+		elif row != None:
+			for label, field in TIME_FIELDS:
+				if line.startswith(label):
+					row[field] = line[len(label):].strip().rstrip("%")
+	if len(rows) == 0:
+		rows.append(base)
+	return rows
+
+## how many times over the GNU time that reported on the commands of rundir reports memory: only
+## versions before 1.8 overreport, and the version is the one record_time_version found when the
+## scripts were written (nothing is corrected for when it is not known)
+def get_mem_overreport(rundir):
+	if not os.path.isfile(rundir + "/" + TIME_VERSION_FILE):
+		return 1
+	versionh = io.open(rundir + "/" + TIME_VERSION_FILE, "r")
+	match = TIME_VERSION.search(versionh.read())
+	versionh.close()
+	if match != None and (int(match.group(1)), int(match.group(2))) < (1, 8):
+		return MEM_OVERREPORT
+	return 1
+
+## nearest-rank percentile of a sorted list
+def percentile(values, pct):
+	return values[max(0, int(math.ceil(pct / 100.0 * len(values))) - 1)]
+
+def write_report(rundir, nprocs):
+	import csv
+	import multiprocessing
+	reportfile = rundir + "/report.csv"
+	overreport = get_mem_overreport(rundir)
+	logs = list()
+	for name in os.listdir(rundir):
+		if LOG_NAME.search(name):
+			logs.append(name)
+
+	## rows from the last report, for files that have not changed since
+	previous = dict()
+	if os.path.isfile(reportfile):
+		reporth = io.open(reportfile, "r", newline = "")
+		for row in csv.DictReader(reporth):
+			previous.setdefault(row["file"], list()).append(row)
+		reporth.close()
+
+	rows    = list()
+	changed = list()
+	for name in logs:
+		stat = os.stat(rundir + "/" + name)
+		old  = previous.get(name)
+		if old != None and old[0]["size"] == str(stat.st_size) and old[0]["mtime"] == repr(stat.st_mtime):
+			rows.extend(old)
+		else:
+			changed.append(rundir + "/" + name)
+
+	## successful commands whose reports earlier reports have not seen go into the history for
+	## --auto-resources: the reports of a changed log beyond those its previous rows had (a log can
+	## be reported on while its commands are still running, and a --onelog log grows all run long)
+	added = list()
+	if len(changed) > 0:
+		pool = multiprocessing.Pool(nprocs or None)
+		for filerows in pool.map(parse_time_reports, changed, chunksize = 64):
+			rows.extend(filerows)
+			reported = [row for row in filerows if row.get("mem_kb")]
+			nseen    = len([row for row in previous.get(filerows[0]["file"], list()) if row.get("mem_kb")])
+			added.extend([row for row in reported[nseen:] if row["exit"] == "0"])
+		pool.close()
+		pool.join()
+
+	if len(added) > 0 and os.path.isfile(rundir + "/commands.txt"):
+		commandsh = io.open(rundir + "/commands.txt", "rb")
+		cmd = get_cmd_name(commandsh.readline())
+		commandsh.close()
+		add_history(cmd, added, overreport)
+
+	reporth = io.open(reportfile, "w", newline = "")
+	writer  = csv.DictWriter(reporth, REPORT_FIELDS)
+	writer.writerow(dict(zip(REPORT_FIELDS, REPORT_FIELDS)))
+	writer.writerows(rows)
+	reporth.close()
+	print("Read " + str(len(changed)) + " new or changed of " + str(len(logs)) + " log files; wrote " + reportfile)
+
+	## percentiles of memory (corrected for GNU time's overreporting) and elapsed time per job
+	if overreport != 1:
+		print("Memory is divided by " + str(overreport) + ", as reported by a GNU time older than 1.8 (see " + TIME_VERSION_FILE + ")")
+	jobs = dict()
+	for row in rows:
+		if row.get("mem_kb"):
+			jobs.setdefault(row["jobid"], list()).append(row)
+	print("\t".join(["jobid", "reports", "failed", "mem_mb_p50", "mem_mb_p90", "mem_mb_p99", "mem_mb_max", "time_s_p50", "time_s_p90", "time_s_p99", "time_s_max"]))
+	for jobid in sorted(jobs.keys()):
+		jobrows = jobs[jobid]
+		mems    = sorted([float(row["mem_kb"]) / overreport / 1024.0 for row in jobrows])
+		times   = sorted([float(row["elapsed_s"]) for row in jobrows if row.get("elapsed_s")] or [0.0])
+		failed  = len([row for row in jobrows if row["exit"] != "0"])
+		stats   = [jobid, str(len(jobrows)), str(failed)]
+		stats.extend(["%.1f" % percentile(mems, pct) for pct in [50, 90, 99, 100]])
+		stats.extend(["%.1f" % percentile(times, pct) for pct in [50, 90, 99, 100]])
+		print("\t".join(stats))
+
+
+########## --auto-resources: memory and time from the history of previous runs
+## .slurm_array_history has one line per successful command harvested by --report:
+## the program name (as in the job name), memory used in kb (corrected) and seconds taken.
+SAH              = ".slurm_array_history"
+HISTORY_KEEP     = 1000     # only the most recent runs of each program are used
+HISTORY_MIN      = 5        # fewer runs than this are not enough to go on
+HISTORY_PCT      = 95
+MEM_HEADROOM     = 1.25
+TIME_HEADROOM    = 1.5
+
+def add_history(cmd, rows, overreport):
+	historyh = io.open(SAH, "a")
+	for row in rows:
+		mem_kb = int(float(row["mem_kb"]) / overreport)
+		historyh.write(cmd + "\t" + str(mem_kb) + "\t" + row["elapsed_s"] + "\n")
+	historyh.close()
+
+## the most recent (mem_kb, seconds) of each run of cmd
+def get_history(cmd):
+	import collections
+	runs = collections.deque(maxlen = HISTORY_KEEP)
+	if os.path.isfile(SAH):
+		historyh = io.open(SAH, "r")
+		for line in historyh:
+			line_list = line.strip().split("\t")
+			if line_list[0] == cmd:
+				runs.append((int(line_list[1]), float(line_list[2])))
+		historyh.close()
+	return list(runs)
+
+def set_auto_resources(args):
+	runs = get_history(args.cmdname)
+	if len(runs) < HISTORY_MIN:
+		sys.stderr.write("auto-resources: only " + str(len(runs)) + " previous runs of " + args.cmdname + " in " + SAH + " (need " + str(HISTORY_MIN) + "); keeping --mem=" + args.memory + " --time=" + args.time + "\n")
+		return
+	mem_kb  = percentile(sorted([run[0] for run in runs]), HISTORY_PCT)
+	seconds = percentile(sorted([run[1] for run in runs]), HISTORY_PCT)
+	args.memory = str(max(1, int(math.ceil(mem_kb * MEM_HEADROOM / 1024.0)))) + "mb"
+	args.time   = format_duration(timedelta(minutes = max(1, int(math.ceil(seconds * TIME_HEADROOM / 60.0)))))
+	sys.stderr.write("auto-resources: from the last " + str(len(runs)) + " runs of " + args.cmdname + " in " + SAH + ":\n")
+	sys.stderr.write("  " + str(HISTORY_PCT) + "th percentile memory " + "%.1f" % (mem_kb / 1024.0) + "mb, plus " + "%d" % round((MEM_HEADROOM - 1) * 100) + "% headroom: --mem=" + args.memory + "\n")
+	sys.stderr.write("  " + str(HISTORY_PCT) + "th percentile time " + "%.1f" % seconds + "s, plus " + "%d" % round((TIME_HEADROOM - 1) * 100) + "% headroom, in whole minutes: --time=" + args.time + "\n")
+
+
+########## --workflow: submit a dependency graph of command lists in one go
+## The workflow file is JSON, with a list of steps, e.g.
+##   {"steps": [
+##     {"name": "assemble", "commands": "assemble_commands.txt", "memory": "64gb", "processors": "8"},
+##     {"name": "qc", "commands": ["fastqc a.fq", "fastqc b.fq"], "after": ["assemble"]}
+##   ]}
+## "name" is the step's rundir (and job name), "commands" is a file of commands (relative to the
+## workflow file) or a list of them, and "after" is a list of the steps it holds for. Any other keys
+## set the options of that name (as in the destinations of the command-line options: memory, time,
+## processors, queue, module, pack...).
+## Steps are submitted a generation at a time, in dependency order; the steps of a generation
+## are written and submitted concurrently, holding for the job numbers of the steps they follow.
+WORKFLOW_THREADS  = 8
+WORKFLOW_RESERVED = ["commandsfile", "rundir", "workflow", "resume", "report", "report_procs", "extract", "watch", "watch_interval", "debug", "showchangelog"]
+
+## sets option key of args to value, as the type the command line would have given it
+def set_option(args, key, value):
+	default = getattr(args, key)
+	if key == "module" and not isinstance(value, list):
+		setattr(args, key, str(value).split())
+	elif isinstance(default, bool) or isinstance(value, list) or value == None:
+		setattr(args, key, value)
+	elif isinstance(default, int):
+		setattr(args, key, int(value))
+	else:
+		setattr(args, key, str(value))
+
+## the options for one step: the command-line options, overridden by the step's own.
+## This runs in the submission threads, so problems are raised rather than quit on.
+def get_step_args(args, step):
+	import copy
+	step_args = copy.copy(args)
+	for key, value in step.items():
+		if key in ["name", "commands", "after"]:
+			continue
+		set_option(step_args, key, value)
+	step_args.rundir    = re.subn(r"/$", "", str(step["name"]))[0]
+	step_args.selection = None
+
+	commands = step["commands"]
+	if not isinstance(commands, list):
+		## a relative path is relative to the workflow file, wherever it is run from
+		commands = io.open(os.path.join(os.path.dirname(args.workflow), commands), "rb")
+	first, step_args.commands = peek_commands(commands)
+	if first == b"":
+		raise SlurmArrayError("no commands given for step " + step["name"] + " of " + args.workflow)
+	step_args.cmdname   = get_cmd_name(first)
+	step_args.timestamp = get_timestamp(step_args.cmdname)
+	return step_args
+
+## checks the steps, and orders them into generations, each of which only holds for steps in earlier ones
+def get_generations(args, steps):
+	by_name = dict()
+	for step in steps:
+		if "name" not in step or "commands" not in step:
+			raise SlurmArrayError("every step of " + args.workflow + " needs a name and commands.")
+		if step["name"] in by_name:
+			raise SlurmArrayError("there is more than one step named " + step["name"] + " in " + args.workflow + ".")
+		by_name[step["name"]] = step
+		for key in step.keys():
+			if key not in ["name", "commands", "after"] and (key in WORKFLOW_RESERVED or not hasattr(args, key)):
+				raise SlurmArrayError("step " + step["name"] + " of " + args.workflow + " sets unknown option '" + key + "'.")
+	for step in steps:
+		after = step.get("after", list())
+		if not isinstance(after, list) or not all([isinstance(name, str) for name in after]):
+			raise SlurmArrayError("the after of step " + str(step["name"]) + " of " + args.workflow + " must be a list of step names, e.g. [\"" + str(after) + "\"].")
+		for name in after:
+			if name not in by_name:
+				raise SlurmArrayError("step " + step["name"] + " of " + args.workflow + " is after unknown step " + name + ".")
+
+	generations = list()
+	placed      = set()
+	while len(placed) < len(steps):
+		generation = [step for step in steps if step["name"] not in placed and set(step.get("after", list())) <= placed]
+		if len(generation) == 0:
+			raise SlurmArrayError("the steps of " + args.workflow + " depend on each other in a cycle.")
+		generations.append(generation)
+		placed.update([step["name"] for step in generation])
+	return generations
+
+## submits the steps of the workflow; returns the job numbers of each step that was submitted, by name.
+## If a step can't be submitted (or with --local, any of its commands fail), the steps after it are
+## not submitted, the steps that were are listed, and SlurmArrayError is raised.
+def submit_workflow(args):
+	import json
+	import subprocess
+	import multiprocessing.pool
+	workflowh = io.open(args.workflow, "rb")
+	steps = json.loads(workflowh.read().decode("utf-8"))["steps"]
+	workflowh.close()
+	generations = get_generations(args, steps)
+	holdfor     = get_holdfor(args)
+	jobnums     = dict()
+
+	## writes one step's rundir and scripts and submits them; returns its name, the job numbers
+	## that were submitted for it, and what went wrong (None if nothing did)
+	def submit_step(step):
+		step_jobnums = list()
+		try:
+			step_args = get_step_args(args, step)
+			check_modes(step_args)
+			if step_args.auto_resources:
+				set_auto_resources(step_args)
+			write_rundir(step_args)
+			step_holdfor = list(holdfor)
+			for name in step.get("after", list()):
+				step_holdfor.extend(jobnums[name])
+			scripts = write_qsubs(step_args, step_holdfor)
+			if args.local > 0 and not args.debug:
+				nfailed = run_local(step_args, scripts)
+				if nfailed > 0:
+					raise SlurmArrayError(str(nfailed) + " commands of " + step_args.rundir + " did not complete successfully.")
+			elif not args.debug:
+				for script in scripts:
+					jobnum = sbatch(script)
+					step_jobnums.append(jobnum)
+					log_job(step_args, jobnum)
+		except subprocess.CalledProcessError as exc:
+			return step["name"], step_jobnums, "Problem submmitting step " + str(step["name"]) + ". Are you sure you're on a machine from which SLURM jobs can be submitted? qsub returncode: " + str(exc.returncode)
+		except (SlurmArrayError, IOError) as exc:
+			return step["name"], step_jobnums, "step " + str(step["name"]) + ": " + str(exc)
+		return step["name"], step_jobnums, None
+
+	errors = list()
+	pool = multiprocessing.pool.ThreadPool(WORKFLOW_THREADS)
+	for generation in generations:
+		if args.debug:
+			print("Writing (not submitting) " + ", ".join([str(step["name"]) for step in generation]))
+		for name, step_jobnums, error in pool.imap_unordered(submit_step, generation):
+			if error != None:
+				errors.append(error)
+			if error == None or len(step_jobnums) > 0:
+				jobnums[name] = step_jobnums
+		if len(errors) > 0:
+			break
+	pool.close()
+	pool.join()
+
+	if len(errors) > 0:
+		done = [name + (" (" + ",".join(jobnums[name]) + ")" if len(jobnums[name]) > 0 else "") for name in sorted(jobnums.keys())]
+		print("Steps already " + ("run" if args.local > 0 else "submitted") + ": " + (", ".join(done) or "none"))
+		raise SlurmArrayError("\n".join(errors))
+	return jobnums
+
+
+########## --local: run the array jobs on this node instead of submitting them
+## The scripts written for sbatch are run as they are, one array task at a time per worker, with
+## the SLURM_ARRAY_* variables set and the #SBATCH --output/--error files, so the rundir ends up
+## just as a cluster run leaves it. The limits Slurm would enforce are set on each task: --mem as
+## the memory.max of a cgroup v2 scope of its own (through systemd-run) where there is one to be
+## had, and otherwise as an address space rlimit, which is per process, so a task whose commands
+## run concurrently (--pack) can use more in all, and programs that reserve a lot of address space
+## (Java, Go) can fail well under it; --filelimit is a file size rlimit. A task that runs over its
+## --time is killed. srun, for the maxcommands loop, is stood in for by LOCAL_SRUN.
+LOCAL_SRUN = textwrap.dedent('''\
+	#!/usr/bin/env bash
+	# Stands in for srun in SLURM_Array --local runs: runs a job step here, with its --output and
+	# --error (%A, %a and %s filled in), killed if it runs over SLURM_ARRAY_LOCAL_STEP_SECONDS.
+	out=/dev/stdout
+	err=/dev/stderr
+	while [[ "$1" == --* ]] ; do
+		case "$1" in
+			--output=*) out="${1#--output=}" ;;
+			--error=*)  err="${1#--error=}" ;;
+		esac
+		shift
+	done
+	steps=${SLURM_ARRAY_LOCAL_DIR}/steps.${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}
+	step=`cat ${steps} 2>/dev/null || echo 0`
+	echo $((step + 1)) > ${steps}
+	out=${out//%A/${SLURM_ARRAY_JOB_ID}} ; out=${out//%a/${SLURM_ARRAY_TASK_ID}} ; out=${out//%s/${step}}
+	err=${err//%A/${SLURM_ARRAY_JOB_ID}} ; err=${err//%a/${SLURM_ARRAY_TASK_ID}} ; err=${err//%s/${step}}
+	timeout ${SLURM_ARRAY_LOCAL_STEP_SECONDS} "$@" > "${out}" 2> "${err}"
+	''')
+SIZE_UNITS = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+## the number of bytes in a size like 4gb, 500G or 800M; with no unit, megabytes (as for sbatch --mem)
+def get_size(size):
+	match = re.match(r"^(\d+)([kmgt]?)b?$", str(size).strip().lower())
+	if match == None:
+		raise ValueError("can't read the size '" + str(size) + "'")
+	return int(match.group(1)) * SIZE_UNITS[match.group(2) or "m"]
+
+## the #SBATCH options of a script, as a dictionary (options that are only flags map to ""),
+## along with the time limit of its srun job steps, if it has any, as "step --time"
+def read_directives(script):
+	directives = dict()
+	scripth = io.open(script, "r")
+	for line in scripth:
+		match = re.match(r"^#SBATCH\s+(-[^=\s]+)=?(\S*)", line)
+		if match != None:
+			directives[match.group(1)] = match.group(2)
+		## the time limit of the job steps of the maxcommands loop
+		match = re.match(r"^\s+--time=(\S+) \\$", line)
+		if match != None:
+			directives["step --time"] = match.group(1)
+	scripth.close()
+	return directives
+
+## runs one array task of a script to the end; returns True if it was killed for running over time
+def run_local_task(task):
+	import resource
+	import signal
+	import subprocess
+	import threading
+	script, jobid, number, directives, env, limits, prefix = task
+	logs = dict()
+	for key in ["--output", "--error"]:
+		logs[key] = directives[key].replace("%A", str(jobid)).replace("%a", str(number))
+	mode   = "ab" if directives.get("--open-mode") == "append" else "wb"
+	stdout = io.open(logs["--output"], mode)
+	if logs["--error"] == logs["--output"]:
+		stderr = stdout
+	else:
+		stderr = io.open(logs["--error"], mode)
+
+	env = dict(env)
+	env["SLURM_ARRAY_JOB_ID"]  = str(jobid)
+	env["SLURM_ARRAY_TASK_ID"] = str(number)
+	env["SLURM_JOB_ID"]        = str(jobid)
+	## in a session of its own, so the whole task can be killed at once
+	def set_limits():
+		os.setsid()
+		for limit, value in limits:
+			resource.setrlimit(limit, (value, value))
+	proc = subprocess.Popen(prefix + ["bash", script], stdin = io.open(os.devnull, "rb"), stdout = stdout, stderr = stderr, env = env, close_fds = True, preexec_fn = set_limits)
+	timedout = list()
+	def kill():
+		timedout.append(True)
+		try:
+			os.killpg(proc.pid, signal.SIGKILL)
+		except OSError:
+			pass
+	timer = threading.Timer(get_duration(directives["--time"]).total_seconds(), kill)
+	timer.start()
+	proc.wait()
+	timer.cancel()
+	if len(timedout) > 0:
+		stderr.write(("SLURM_Array --local: *** TASK " + str(jobid) + "_" + str(number) + " CANCELLED AT " + datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S") + " DUE TO TIME LIMIT ***\n").encode("ascii"))
+	stdout.close()
+	if stderr is not stdout:
+		stderr.close()
+	return len(timedout) > 0
+
+## whether each task can be run in a cgroup v2 scope of its own, with a memory.max, by systemd-run
+def have_memory_cgroups():
+	import subprocess
+	if not os.path.isfile("/sys/fs/cgroup/cgroup.controllers"):
+		return False
+	devnull = io.open(os.devnull, "r+b")
+	try:
+		status = subprocess.call(["systemd-run", "--user", "--scope", "--quiet", "-p", "MemoryMax=" + str(get_size("1g")), "true"], stdin = devnull, stdout = devnull, stderr = devnull)
+	except OSError:
+		status = 1
+	devnull.close()
+	return status == 0
+
+## runs the array jobs of the scripts with a pool of args.local workers; returns the number of
+## commands that did not complete successfully, according to completed.tsv
+def run_local(args, scripts):
+	import resource
+	import shutil
+	import tempfile
+	import multiprocessing.pool
+	localdir = tempfile.mkdtemp(prefix = "SLURM_Array.local.")
+	srunh = io.open(localdir + "/srun", "w")
+	srunh.write(LOCAL_SRUN)
+	srunh.close()
+	os.chmod(localdir + "/srun", 0o755)
+
+	env = dict(os.environ)
+	env["PATH"] = localdir + os.pathsep + env.get("PATH", "")
+	env["SLURM_ARRAY_LOCAL_DIR"]          = localdir
+	limits  = [(resource.RLIMIT_FSIZE, get_size(args.filelimit))]
+	cgroups = have_memory_cgroups()
+
+	tasks = list()
+	for shard, script in enumerate(scripts):
+		directives = read_directives(script)
+		jobid = os.getpid() + shard
+		task_env = dict(env)
+		task_env["SLURM_CPUS_PER_TASK"] = directives["--cpus-per-task"]
+		task_env["SLURM_ARRAY_LOCAL_STEP_SECONDS"] = str(int(get_duration(directives.get("step --time", args.time)).total_seconds()))
+		if cgroups:
+			task_limits = limits
+			prefix = ["systemd-run", "--user", "--scope", "--quiet", "-p", "MemoryMax=" + str(get_size(directives["--mem"])), "-p", "MemorySwapMax=0"]
+		else:
+			task_limits = limits + [(resource.RLIMIT_AS, get_size(directives["--mem"]))]
+			prefix = list()
+		for number in expand_array(directives["--array"]):
+			tasks.append((script, jobid, number, directives, task_env, task_limits, prefix))
+
+	print("Running the " + str(len(tasks)) + " array tasks of " + args.rundir + " here, " + str(args.local) + " at a time, with memory limited " + ("by a cgroup for each task" if cgroups else "by an rlimit for each process"))
+	pool = multiprocessing.pool.ThreadPool(args.local)
+	ntimedout = sum(pool.map(run_local_task, tasks, 1))
+	pool.close()
+	pool.join()
+	shutil.rmtree(localdir)
+
+	## the last exit status recorded for each command
+	statuses = dict()
+	if os.path.isfile(args.rundir + "/completed.tsv"):
+		completedh = io.open(args.rundir + "/completed.tsv", "r")
+		for line in completedh:
+			line_list = line.rstrip("\n").split("\t")
+			if len(line_list) == 3:
+				statuses[line_list[2]] = line_list[1]
+		completedh.close()
+	ncmds   = os.path.getsize(args.rundir + "/commands.idx") // IDX_RECORD
+	nfailed = ncmds - len([status for status in statuses.values() if status == "0"])
+	print("Finished " + args.rundir + ": " + str(nfailed) + " commands did not complete successfully, and " + str(ntimedout) + " array tasks ran out of time.")
+	return nfailed
+
+
+########## --watch: follow the progress of the jobs in the registry
+## All of the jobs being watched are asked about in one sacct call per poll. After the first poll,
+## sacct is only asked for what was pending or running since the last one (-S), so array tasks that
+## have ended are not asked for again: their states are kept in a cache, and an array job with no
+## tasks left pending or running is dropped from the polls. Polls slow down (up to WATCH_MAX
+## seconds apart) while nothing changes, and speed up again when things do, but are never less
+## than WATCH_MIN seconds apart.
+WATCH_MIN     = 10
+WATCH_MAX     = 600
+WATCH_BACKOFF = 1.5
+WATCH_OVERLAP = 60        # seconds of overlap between polls, for clock differences with slurmdbd
+WATCH_MISSING = 3         # polls a job can be missing from sacct before it is given up on
+WATCH_ERRORS  = 5         # sacct calls in a row that can fail before the watch is given up on
+WATCH_DONE    = ["COMPLETED"]
+WATCH_FAILED  = ["FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL", "BOOT_FAIL", "DEADLINE", "PREEMPTED", "REVOKED"]
+WATCH_PENDING = ["PENDING", "REQUEUED", "REQUEUE_FED", "REQUEUE_HOLD"]
+
+## the number of array tasks in a pending record's task list, e.g. 1234_[5-899%100] or 1234_[1,3-5]
+def count_tasks(jobid):
+	match = re.match(r"^\d+_\[([^\]]*)\]$", jobid)
+	if match == None:
+		return 1
+	return len(expand_array(match.group(1)))
+
+## one batched sacct call for all of jobnums; returns lines of (task or pending record, state)
+def poll_sacct(jobnums, since):
+	import subprocess
+	command = ["sacct", "--noheader", "--parsable2", "--allocations", "--format=JobID,State", "--jobs=" + ",".join(jobnums)]
+	if since != None:
+		command.extend(["--starttime=" + since.strftime("%Y-%m-%dT%H:%M:%S"), "--endtime=now"])
+	output = subprocess.check_output(command).decode("utf-8", "replace")
+	records = list()
+	for line in output.splitlines():
+		line_list = line.strip().split("|")
+		if len(line_list) >= 2 and line_list[0] != "":
+			records.append((line_list[0], line_list[1].split(" ")[0]))
+	return records
+
+## the counts of a poll, for printing
+def format_watch(counts, rate, remaining):
+	line = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+	for state in ["pending", "running", "completed", "failed"]:
+		line = line + "  " + state + " " + str(counts[state])
+	if rate > 0:
+		eta = timedelta(seconds = int(remaining / rate))
+		line = line + "  (" + "%.1f" % (rate * 60) + " tasks/min, ETA " + format_duration(eta) + ")"
+	return line
+
+## watches the jobs logged under names (comma-sep regular expressions, or all of the jobs in the
+## registry if names is None) until none of their array tasks are pending or running, polling at
+## least interval (and WATCH_MIN) seconds apart; returns the number of array tasks that failed
+def watch_jobs(names, interval):
+	import time
+	import subprocess
+	if interval < WATCH_MIN:
+		sys.stderr.write("Warning: polling sacct every " + str(interval) + " seconds is too often; polling every " + str(WATCH_MIN) + " seconds instead.\n")
+		interval = WATCH_MIN
+	if names == None:
+		jobnums = get_hold_jobs()
+	else:
+		jobnums = get_hold_jobs_by_names(names, "watch")
+	active  = distinct(jobnums)
+	missing = dict((jobnum, 0) for jobnum in active)
+	ended   = dict()
+	if len(active) == 0:
+		raise SlurmArrayError("no jobs to watch in " + SAJDB + ".")
+	print("Watching " + str(len(active)) + " jobs from " + SAJDB)
+
+	since    = None
+	delay    = interval
+	previous = None
+	first    = None
+	errors   = 0
+	while len(active) > 0:
+		started = datetime.datetime.now()
+		## a failed sacct call (slurmdbd busy or restarting, say) is tried again later, backing off as
+		## when nothing changes; what is known of the jobs so far is kept
+		try:
+			records = poll_sacct(active, since)
+		except subprocess.CalledProcessError as exc:
+			errors = errors + 1
+			if errors >= WATCH_ERRORS:
+				raise SlurmArrayError("sacct failed " + str(errors) + " times in a row (returncode " + str(exc.returncode) + "); no longer watching.")
+			delay = min(WATCH_MAX, delay * WATCH_BACKOFF)
+			sys.stderr.write("Warning: sacct failed (returncode " + str(exc.returncode) + "); trying again in " + str(int(delay)) + " seconds.\n")
+			time.sleep(delay)
+			continue
+		errors  = 0
+		since   = started - timedelta(seconds = WATCH_OVERLAP)
+
+		counts = {"pending": 0, "running": 0}
+		live   = set()
+		for jobid, state in records:
+			jobnum = jobid.split("_")[0]
+			if jobid in ended:
+				continue
+			if state in WATCH_DONE or state in WATCH_FAILED:
+				ended[jobid] = state
+			elif state in WATCH_PENDING:
+				counts["pending"] = counts["pending"] + count_tasks(jobid)
+				live.add(jobnum)
+			else:
+				counts["running"] = counts["running"] + 1
+				live.add(jobnum)
+			missing[jobnum] = None
+		counts["completed"] = len([state for state in ended.values() if state in WATCH_DONE])
+		counts["failed"]    = len(ended) - counts["completed"]
+
+		## jobs with nothing pending or running are finished; jobs sacct never knew of are given up on
+		for jobnum in list(active):
+			if missing[jobnum] != None:
+				missing[jobnum] = missing[jobnum] + 1
+				if missing[jobnum] < WATCH_MISSING:
+					continue
+				sys.stderr.write("Warning: sacct does not know of job " + jobnum + "; no longer watching it.\n")
+			if jobnum not in live:
+				active.remove(jobnum)
+
+		now = time.time()
+		if first == None:
+			first = (now, len(ended))
+		rate = 0
+		if now > first[0]:
+			rate = (len(ended) - first[1]) / (now - first[0])
+		print(format_watch(counts, rate, counts["pending"] + counts["running"]))
+		sys.stdout.flush()
+		if len(active) == 0:
+			break
+
+		if counts == previous:
+			delay = min(WATCH_MAX, delay * WATCH_BACKOFF)
+		else:
+			delay = max(interval, delay / WATCH_BACKOFF)
+		previous = counts
+		time.sleep(delay)
+	return counts["failed"]
+
+## the distinct items of a list, in order
+def distinct(items):
+	seen     = set()
+	distinct = list()
+	for item in items:
+		if item not in seen:
+			seen.add(item)
+			distinct.append(item)
+	return distinct
+
+
+########## submitting: the command line and submit() both end up in run()
+
+## --pack, --shard and --dynamic are each a different way of running more commands than array
+## tasks, so only one of them can be given
+def check_modes(args):
+	modes = [option for option, given in [("--pack", args.pack > 0), ("--shard", args.shard), ("--dynamic", args.dynamic)] if given]
+	if len(modes) > 1:
+		raise SlurmArrayError(" and ".join(modes) + " can't be used together: each is a different way of running more commands than there are array tasks.")
+
+## writes the rundir, with args.commands in it
+def write_rundir(args):
+	make_rundir(args.rundir, args.keep_old)
+	args.annotated = dict()
+	args.ncommands = write_commands(args.commands, args.rundir, args.annotated)
+	args.ntotal    = args.ncommands
+	record_time_version(args.rundir)
+
+## writes the rundir and submit scripts for args and submits them, or runs them with --local;
+## returns the job numbers (none for -d or --local)
+def run(args):
+	check_modes(args)
+	if args.auto_resources:
+		set_auto_resources(args)
+	args.selection = None
+	if args.resume != None:
+		args.annotated = dict()
+		args.ncommands = plan_resume(args)
+		if args.ncommands == 0:
+			return list()
+	else:
+		write_rundir(args)
+	scripts = write_qsubs(args)
+
+	if args.debug:
+		return list()
+	if args.local > 0:
+		nfailed = run_local(args, scripts)
+		if nfailed > 0:
+			raise SlurmArrayError(str(nfailed) + " commands of " + args.rundir + " did not complete successfully.")
+		return list()
+	return exec_qsub(args, scripts)
+
+## the options that only make sense on the command line
+SUBMIT_RESERVED = ["commandsfile", "workflow", "resume", "report", "report_procs", "extract", "watch", "watch_interval", "showchangelog"]
+
+def submit(commands, **resources):
+	"""Submits commands as a SLURM array job, and returns the job numbers (as strings).
+
+	commands is an iterable of command lines, as text or bytes (such as a list, or an open file),
+	or one string of them. The options are those of the command line, by the names of their
+	destinations: e.g. memory = "8gb", time = "1-00:00:00", processors = 4, queue = "batch",
+	rundir = "assembly", pack = 16, hold_name_list = "previous_.+". Options not given have their
+	command-line defaults. With debug = True or local = N, nothing is submitted and no job numbers
+	are returned. Raises SlurmArrayError if there are no commands, or if submission fails.
+	"""
+	from .cli import build_parser
+	args = build_parser().parse_args([])
+	for key, value in resources.items():
+		if key in SUBMIT_RESERVED or not hasattr(args, key):
+			raise TypeError("submit() got an unexpected keyword argument '" + key + "'")
+		set_option(args, key, value)
+	if isinstance(commands, str) or isinstance(commands, bytes):
+		commands = commands.splitlines()
+
+	first, args.commands = peek_commands(commands)
+	if first == b"":
+		raise SlurmArrayError("no commands given.")
+	args.cmdname   = get_cmd_name(first)
+	args.timestamp = get_timestamp(args.cmdname)
+	if args.rundir == None:
+		args.rundir = args.timestamp
+	args.rundir = re.subn(r"/$", "", args.rundir)[0]
+	return run(args)
+
+## submits one script; returns its job number
+def sbatch(script):
+	import subprocess
+	res = subprocess.check_output("sbatch -Q '" + script + "'", shell = True).decode("utf-8")
+	return re.subn("[A-Za-z ]", "", res.strip())[0]
+
+## executes qsub on each of the scripts written by write_qsubs; returns the job numbers
+def exec_qsub(args, scripts):
+	import shutil
+	import subprocess
+	jobnums = list()
+	for script in scripts:
+		try:
+			jobnum = sbatch(script)
+		except subprocess.CalledProcessError as exc:
+			message = "Problem submmitting. Are you sure you're on a machine from which SLURM jobs can be submitted? qsub returncode: " + str(exc.returncode)
+			if len(jobnums) == 0 and args.resume == None:
+				shutil.rmtree(args.rundir)
+			elif len(jobnums) == 0:
+				# the rundir is the one being resumed: only take back what this resume wrote
+				remove_resume(args, scripts)
+			else:
+				# earlier shards are already queued and will write into the rundir
+				message = message + "\nAlready submitted and logged jobs " + ",".join(jobnums) + " for the earlier shards; not submitting " + script + " or the shards after it."
+			raise SlurmArrayError(message)
+
+		jobnums.append(jobnum)
+		log_job(args, jobnum)
+	return jobnums
+
+## removes the indexes (its own and its resource classes'), --dynamic counters and scripts written for a --resume
+## that could not be submitted, leaving the rundir as it was
+def remove_resume(args, scripts):
+	resume = args.selection.split(".")[0]
+	for name in os.listdir(args.rundir):
+		if re.match(r"^(claim\.)?" + resume + r"(_class\d+)?\.(idx|next)$", name):
+			os.remove(args.rundir + "/" + name)
+	for script in scripts:
+		if os.path.isfile(script):
+			os.remove(script)
+
+## reports a submitted job, and logs it to the registry
+def log_job(args, jobnum):
+	if args.HOLD:
+		print("Successfully submitted job " + jobnum + ", logging job number, timestamp, and rundir to " + SAJDB + "\n THIS JOB IS ON HOLD. TO RELEASE, ENTER scontrol release " + jobnum + " IN YOUR TERMINAL")
+		jobfile = io.open(args.rundir + "/jobnum.txt", "a")
+		jobfile.write("scontrol release " + jobnum + "_\n")
+		jobfile.close()
+	else:
+		print("Successfully submitted job " + jobnum + ", logging job number, timestamp, and rundir to " + SAJDB)
+	register_job(jobnum, args.timestamp, args.rundir)